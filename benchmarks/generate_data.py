@@ -0,0 +1,113 @@
+"""
+Synthetic course enrollment data for benchmarking.
+
+Generates one row per course taken, in the Item/ID/EventTime/Department shape described by
+`get_data_dictionary` (plus TimeGroup, CreditHours, FinalGrade and FinalGradeN), e.g.:
+
+    python benchmarks/generate_data.py --students 5000 --departments 6 -o data/synthetic.csv
+"""
+from argparse import ArgumentParser
+import numpy as np
+import pandas as pd
+
+# Month each semester starts in, and its digit in the TimeGroup (year * 10 + quarter)
+SEMESTERS = (('Spring', 1, 1), ('Summer', 6, 2), ('Fall', 9, 3))
+GRADES = np.array(['A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'D', 'F'])
+GRADE_POINTS = np.array([12, 11, 10, 9, 8, 7, 6, 3, 0])
+
+DEPARTMENTS = ['BISC', 'CHEM', 'MATH', 'PHYS', 'CISC', 'ECON', 'PSYC', 'HIST', 'ENGL', 'PHIL']
+
+def department_codes(count):
+    """Return ``count`` distinct four-letter department codes, made up (DA00, DA01, ...) past the usual ones."""
+    return (DEPARTMENTS + [f"D{chr(65 + i // 100)}{i % 100:02d}" for i in range(max(0, count - len(DEPARTMENTS)))])[:count]
+
+def generate_course_data(students=1000, departments=4, courses_per_department=40, terms_per_student=8, courses_per_term=4,
+                         skew=1.1, summer_rate=0.1, start_year=2010, years=6, seed=0):
+    """
+    Generate synthetic enrollments.
+
+    Args:
+        students (int): Number of students.
+        departments (int): Number of departments.
+        courses_per_department (int): Number of courses offered by each department.
+        terms_per_student (float): Mean number of terms a student takes courses in.
+        courses_per_term (float): Mean number of courses a student takes per term.
+        skew (float): Zipf exponent of course popularity within a department; 0 makes all courses equally popular.
+        summer_rate (float): Probability that a student takes the summer semester of a year.
+        start_year (int): First year students can start in.
+        years (int): Number of years over which students start.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        DataFrame: One row per course taken, with ID, Item, Department, EventTime, TimeGroup, CreditHours,
+        FinalGrade and FinalGradeN columns. A student takes each course at most once per term.
+    """
+    rng = np.random.default_rng(seed)
+    codes = department_codes(departments)
+
+    # Courses are numbered by level, so the most popular courses of a department are its introductory ones
+    course_numbers = 1000 * (1 + (np.arange(courses_per_department) * 4) // courses_per_department) + np.arange(courses_per_department)
+    popularity = 1.0 / np.arange(1, courses_per_department + 1) ** skew
+    popularity /= popularity.sum()
+
+    # Each student majors in one department and takes most of their courses there
+    majors = rng.integers(departments, size=students)
+    terms = np.maximum(1, rng.poisson(terms_per_student, size=students))
+    first_years = start_year + rng.integers(years, size=students)
+
+    # One row per (student, term)
+    term_students = np.repeat(np.arange(students), terms)
+    term_index = np.arange(len(term_students)) - np.repeat(np.cumsum(terms) - terms, terms)
+    with_summer = rng.random(len(term_students)) < summer_rate
+    semester = np.where(term_index % 2 == 0, 0, 2)
+    semester[with_summer & (semester == 2)] = 1
+    term_years = first_years[term_students] + term_index // 2
+
+    # One row per (student, term, course)
+    sizes = np.maximum(1, rng.poisson(courses_per_term, size=len(term_students)))
+    row_terms = np.repeat(np.arange(len(term_students)), sizes)
+    row_students = term_students[row_terms]
+    in_major = rng.random(len(row_terms)) < 0.7
+    row_departments = np.where(in_major, majors[row_students], rng.integers(departments, size=len(row_terms)))
+    row_courses = rng.choice(courses_per_department, size=len(row_terms), p=popularity)
+    grades = rng.choice(len(GRADES), size=len(row_terms), p=[0.2, 0.15, 0.15, 0.15, 0.1, 0.08, 0.07, 0.05, 0.05])
+
+    semester_names = np.array([name for name, _, _ in SEMESTERS])
+    semester_months = np.array([month for _, month, _ in SEMESTERS])
+    semester_quarters = np.array([quarter for _, _, quarter in SEMESTERS])
+    row_semesters = semester[row_terms]
+    row_years = term_years[row_terms]
+
+    df = pd.DataFrame({
+        'ID': pd.Series(row_students).map('S{:07d}'.format),
+        'Item': pd.Series(np.array(codes, dtype=object)[row_departments]) + pd.Series(course_numbers[row_courses].astype(str)),
+        'Department': np.array(codes, dtype=object)[row_departments],
+        'Year': row_years,
+        'Semester': semester_names[row_semesters],
+        'EventTime': pd.to_datetime(pd.DataFrame({'year': row_years, 'month': semester_months[row_semesters], 'day': 1})).dt.strftime('%Y-%m-%d'),
+        'TimeGroup': row_years * 10 + semester_quarters[row_semesters],
+        'CreditHours': rng.choice([1, 3, 4], size=len(row_terms), p=[0.1, 0.6, 0.3]),
+        'FinalGrade': GRADES[grades],
+        'FinalGradeN': GRADE_POINTS[grades],
+    })
+    return df.drop_duplicates(['ID', 'TimeGroup', 'Item'], ignore_index=True)
+
+def main():
+    parser = ArgumentParser(description="Generate synthetic course enrollment data.")
+    parser.add_argument("-o", "--output", required=True, help="Output CSV file.")
+    parser.add_argument("--students", type=int, default=1000, help="Number of students. Default: 1000.")
+    parser.add_argument("--departments", type=int, default=4, help="Number of departments. Default: 4.")
+    parser.add_argument("--courses-per-department", type=int, default=40, help="Courses offered by each department. Default: 40.")
+    parser.add_argument("--terms-per-student", type=float, default=8, help="Mean number of terms per student. Default: 8.")
+    parser.add_argument("--courses-per-term", type=float, default=4, help="Mean number of courses per term. Default: 4.")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of course popularity. Default: 1.1.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed. Default: 0.")
+    args = parser.parse_args()
+
+    df = generate_course_data(args.students, args.departments, args.courses_per_department, args.terms_per_student,
+                              args.courses_per_term, args.skew, seed=args.seed)
+    df.to_csv(args.output, index=False)
+    print(f"Wrote {len(df)} rows for {args.students} students to {args.output}")
+
+if __name__ == "__main__":
+    main()
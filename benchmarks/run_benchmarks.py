@@ -0,0 +1,146 @@
+"""
+End-to-end benchmarks of the mining pipeline on synthetic data.
+
+Every stage (date parsing, time grouping, sequence encoding and deduplication, candidate join and
+counting, and a full run of each engine) is timed at several scales, and the timings are written as
+JSON. Passing an earlier output as ``--baseline`` compares against it and exits with status 1 on a
+regression:
+
+    python benchmarks/run_benchmarks.py -o bench.json
+    python benchmarks/run_benchmarks.py --baseline bench.json -o bench_new.json
+"""
+import json
+import platform
+import sys
+import time
+from argparse import ArgumentParser
+from datetime import datetime
+from os import path
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), '..', 'src', 'gsp_toolkit'))
+
+from generate_data import generate_course_data
+from utils import parse_dates, timegroup_column
+from data_processing import insert_delimitor
+from gsp_algorithm import join_itemsets, prune_candidates, count_candidates, mine_sequences
+
+# Number of students of each scale
+SCALES = {'small': 500, 'medium': 2000, 'large': 5000}
+
+def time_stage(function, repeats):
+    """Return the best wall time of ``repeats`` calls of ``function``, and its last result."""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def benchmark_scale(students, support_ratio, repeats, engines, scan_limit, seed):
+    """
+    Time every stage of the pipeline on one synthetic dataset.
+
+    Returns:
+        list: One {"stage", "seconds"} record per stage.
+    """
+    df = generate_course_data(students=students, seed=seed)
+    raw_times = df['EventTime'].copy()
+    min_support = max(2, int(support_ratio * students))
+    records = []
+
+    def record(stage, function):
+        seconds, result = time_stage(function, repeats)
+        records.append({'stage': stage, 'seconds': seconds})
+        return result
+
+    def parse():
+        df['EventTime'] = raw_times
+        return parse_dates(df, 'EventTime')
+
+    def group_times():
+        # The computation of `create_timegroup`, without the copy of the table it saves to the data folder
+        df['TimeGroup'] = timegroup_column(df['EventTime'], 'Q')
+
+    record('parse_dates', parse)
+    record('timegroup_column', group_times)
+
+    with TemporaryDirectory() as folder:
+        sequence_db = record('insert_delimitor', lambda: insert_delimitor(df, folder))
+    record('deduplicate', sequence_db.deduplicate)
+
+    singles = [((item,),) for item in prune_candidates(sequence_db.item_supports(), min_support)]
+    candidates = record('join_itemsets', lambda: join_itemsets(singles))
+    record('count_hashtree', lambda: count_candidates(candidates, sequence_db, 'hashtree'))
+    if students <= scan_limit:
+        record('count_scan', lambda: count_candidates(candidates, sequence_db, 'scan'))
+
+    for engine in engines:
+        record(f"mine_{engine}", lambda: mine_sequences(sequence_db, min_support, engine=engine))
+
+    for entry in records:
+        entry.update({'students': students, 'rows': len(df), 'min_support': min_support})
+    return records
+
+def compare(results, baseline, tolerance):
+    """Print the ratio of each timing to the baseline, returning the regressions beyond ``tolerance``."""
+    reference = {(entry['scale'], entry['stage']): entry['seconds'] for entry in baseline['results']}
+    regressions = []
+    print(f"{'scale':<8} {'stage':<18} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for entry in results:
+        key = (entry['scale'], entry['stage'])
+        if key not in reference:
+            continue
+        ratio = entry['seconds'] / reference[key] if reference[key] > 0 else float('inf')
+        flag = ' !' if ratio > tolerance else ''
+        print(f"{key[0]:<8} {key[1]:<18} {reference[key]:>10.4f} {entry['seconds']:>10.4f} {ratio:>7.2f}{flag}")
+        if ratio > tolerance:
+            regressions.append(key)
+    return regressions
+
+def main():
+    parser = ArgumentParser(description="Benchmark the mining pipeline on synthetic course data.")
+    parser.add_argument("-o", "--output", required=False, help="JSON file the timings are written to.")
+    parser.add_argument("--scales", default=','.join(SCALES), help=f"Comma-separated scales among {', '.join(f'{name} ({students} students)' for name, students in SCALES.items())}. Default: all.")
+    parser.add_argument("--support", type=float, default=0.15, help="Min support as a fraction of the students. Default: 0.15.")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs of each stage; the best time is kept. Default: 3.")
+    parser.add_argument("--engines", default="gsp,spade,prefixspan", help="Comma-separated engines to run end to end. Default: all.")
+    parser.add_argument("--scan-limit", type=int, default=500, help="Largest number of students the 'scan' counting backend is timed on. Default: 500.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic data. Default: 0.")
+    parser.add_argument("--baseline", required=False, help="Earlier JSON output to compare against.")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="Slowdown ratio over the baseline reported as a regression. Default: 1.25.")
+    args = parser.parse_args()
+
+    results = []
+    for scale in args.scales.split(','):
+        print(f"Benchmarking {scale} ({SCALES[scale]} students) ...")
+        for entry in benchmark_scale(SCALES[scale], args.support, args.repeats, args.engines.split(','), args.scan_limit, args.seed):
+            entry['scale'] = scale
+            results.append(entry)
+            print(f"  {entry['stage']:<18} {entry['seconds']:.4f} s")
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} stage(s) slower than {args.tolerance}x the baseline.")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,18 @@
-from os import getcwd
+from os import getcwd, cpu_count
 from argparse import ArgumentParser, RawTextHelpFormatter
 from sys import argv, exit
 from webbrowser import open
 from gsp_algorithm import execute_tool
 import pandas as pd
-from utils import preprocess_time, parse_dates, create_timegroup, get_timegroup_unit
+from utils import preprocess_time, parse_dates, create_timegroup, get_timegroup_unit, choose_time_column, get_ordering, FAILING_GRADES
+from streaming import CsvSource
+from sequence_cache import CachedInput
+from result_cache import ResultCache
+from incremental import IncrementalMiner
+from metrics import RunMetrics
 from os import path, makedirs
+from contextlib import nullcontext
+from tempfile import TemporaryDirectory
 
 def print_introduction():
     introduction_text = """
@@ -50,39 +57,158 @@ def main():
 For more detailed examples, use --manual.""")
 
     parser.add_argument("-i", "--input", required=True, help="Input CSV file.")
-    parser.add_argument("-s", "--support", required=True, help="Comma-separated support thresholds (e.g., 50,100).")
+    parser.add_argument("-s", "--support", required=False, help="Comma-separated support thresholds (e.g., 50,100). Required unless --top-k is given.")
     parser.add_argument("-c", "--categories", required=False, help="Comma-separated categories (e.g., BIO,CHEM).")
     parser.add_argument("-m", "--mode", choices=['separate', 'together'], default='separate', help="Run 'separate' or 'together'. Default: separate.")
     parser.add_argument("-o", "--output", required=False, default=output_path, help="Output directory for results. Default: top-level output folder.")
+    parser.add_argument("-e", "--engine", choices=['gsp', 'spade', 'prefixspan'], default='gsp', help="Mining engine: level-wise 'gsp', vertical id-list 'spade' or pattern-growth 'prefixspan'. Default: gsp.")
+    parser.add_argument("--counting", choices=['hashtree', 'scan'], default='hashtree', help="Support counting backend: 'hashtree' or the original 'scan'. Default: hashtree.")
     parser.add_argument("--concurrency", action='store_true', help="Enable concurrency and prompt to create TimeGroup if not present.")
+    parser.add_argument("--independent-thresholds", action='store_true', help="Mine every support threshold from scratch instead of mining once at the lowest and deriving the others.")
+    parser.add_argument("--department-workers", type=int, default=1, help="Number of processes running departments and supports concurrently in 'separate' mode. Default: 1.")
+    parser.add_argument("--workers", type=int, required=False, help="Number of processes used to count supports. Default: all cores with --concurrency, otherwise 1.")
+    parser.add_argument("--stream", action='store_true', help="Read the input in chunks instead of loading it whole, for files larger than memory.\nThe file needs a TimeGroup or an EventTime column.")
+    parser.add_argument("--chunksize", type=int, default=1_000_000, help="Number of rows read at a time with --stream. Default: 1000000.")
+    parser.add_argument("--cache-dir", required=False, help="Cache the encoded sequences in this directory, keyed by the input file contents, options\nand answers to the time prompts, which are asked before the cache is looked up. Later runs on the same file\nstart mining without reading it.")
+
+    parser.add_argument("--result-cache", required=False, help="Cache mined results in this directory; runs repeating the data and options of an earlier run,\nat the same or a higher support, skip mining.")
+    parser.add_argument("--result-cache-size", type=int, default=256, help="Size in MB the result cache is trimmed to, least recently used first. Default: 256.")
+    parser.add_argument("--incremental", required=False, help="Keep the results of each department in this directory and, on later runs, update them with the\nstudents whose sequences changed (e.g. after appending a term) instead of mining from scratch.")
+    parser.add_argument("--border-ratio", type=float, default=0.8, help="With --incremental, full runs mine at this fraction of the support to track near-frequent\nsequences; lower values re-mine less often. Default: 0.8.")
+
+    parser.add_argument("--max-length", type=int, required=False, help="Longest sequences mined, in courses. Default: no limit.")
+    parser.add_argument("--candidate-batch", type=int, required=False, help="Largest number of candidates the 'gsp' engine counts at once, bounding the memory of a level\nat the cost of one pass over the data per batch. Default: a whole level.")
+    parser.add_argument("--spill-dir", required=False, help="Write mined levels to a temporary folder in this directory as they complete and stream them\nto the CSVs, instead of keeping every level in memory.")
+
+    parser.add_argument("--top-k", type=int, required=False, help="Find the k most frequent sequences of each department instead of those above a support;\nthe support reached is written to the log. With -s, the lowest support is a floor. 'gsp' engine only.")
+    parser.add_argument("--patterns", choices=['all', 'closed', 'maximal'], default='all', help="Sequences exported: 'all' frequent ones, 'closed' ones (no longer sequence with the same support)\nor 'maximal' ones (no longer frequent sequence). 'prefixspan' engine only. Default: all.")
+
+    parser.add_argument("--min-gap", type=float, required=False, help="Only count sequences whose consecutive terms are more than this many time groups apart\n(e.g. 1 to skip the next semester). 'gsp' engine only.")
+    parser.add_argument("--max-gap", type=float, required=False, help="Only count sequences whose consecutive terms are at most this many time groups apart\n(e.g. 2 for courses taken within 2 semesters of each other). 'gsp' engine only.")
+    parser.add_argument("--window", type=float, required=False, help="Let the courses of one term of a sequence be taken up to this many time groups apart. 'gsp' engine only.")
+
+    parser.add_argument("--passing-only", action='store_true', help=f"Only keep the courses passed (FinalGrade other than {', '.join(FAILING_GRADES[:-1])} or {FAILING_GRADES[-1]}).")
+    parser.add_argument("--min-grade", type=float, required=False, help="Only keep the courses with a FinalGradeN of at least this value.")
+    parser.add_argument("--min-credit-hours", type=float, required=False, help="Only keep the courses worth at least this many CreditHours.")
+    parser.add_argument("--grade-buckets", action='store_true', help="Tag each course with the letter of its FinalGrade (e.g. MATH1001:A for an A-),\nso the same course taken with different grades makes different items.")
 
     # Parse the rest of the arguments
     args = parser.parse_args()
+    if args.support is None and args.top_k is None:
+        parser.error("one of -s/--support or --top-k is required")
+    if args.top_k is not None and args.engine != 'gsp':
+        parser.error("--top-k requires the 'gsp' engine")
+    if args.top_k is not None and args.incremental:
+        parser.error("--top-k cannot be combined with --incremental")
+    if args.patterns != 'all' and args.engine != 'prefixspan':
+        parser.error(f"--patterns {args.patterns} requires the 'prefixspan' engine")
+    if args.patterns != 'all' and args.incremental:
+        parser.error("--patterns cannot be combined with --incremental")
+    if any(value is not None for value in (args.min_gap, args.max_gap, args.window)):
+        if args.engine != 'gsp':
+            parser.error("--min-gap, --max-gap and --window require the 'gsp' engine")
+        if args.incremental:
+            parser.error("--min-gap, --max-gap and --window cannot be combined with --incremental")
 
     # Convert string inputs to the correct format
-    support_thresholds = [float(threshold) for threshold in args.support.split(",")]
+    support_thresholds = [float(threshold) for threshold in args.support.split(",")] if args.support else []
 
     if args.categories:
         categories = args.categories.split(",")
     else:
         categories = []
 
-    df = pd.read_csv(args.input)
-
-    if 'EventTime' not in df.columns:
-        df, _ = preprocess_time(df)
+    enrollment_filters = {}
+    if args.passing_only:
+        enrollment_filters['passing_only'] = True
+    if args.min_grade is not None:
+        enrollment_filters['min_grade'] = args.min_grade
+    if args.min_credit_hours is not None:
+        enrollment_filters['min_credit_hours'] = args.min_credit_hours
+    if args.grade_buckets:
+        enrollment_filters['grade_buckets'] = True
+
+    # Preprocessing stages are recorded before the run folder exists and written to its metrics.jsonl
+    metrics = RunMetrics()
+
+    # Answers to the time prompts; with a cache they are asked upfront, as they change the encoded sequences
+    answers = {}
+    if args.cache_dir:
+        answers = time_prompt_answers(args.input, args.stream, args.concurrency)
+
+    def load_input():
+        if args.stream:
+            # Rows are filtered and encoded chunk by chunk; no preprocessed copy of the file is written
+            timegroup_unit = answers.get('timegroup_unit')
+            if timegroup_unit is None and args.concurrency and 'TimeGroup' not in pd.read_csv(args.input, nrows=0).columns:
+                timegroup_unit = get_timegroup_unit()
+            df = CsvSource(args.input, chunksize=args.chunksize, timegroup_unit=timegroup_unit)
+        else:
+            with metrics.stage("read_csv"):
+                df = pd.read_csv(args.input)
+
+            if 'EventTime' not in df.columns:
+                with metrics.stage("preprocess_time", rows=len(df)):
+                    df, _ = preprocess_time(df, column_name=answers.get('time_column'), ordered_values=answers.get('semester_order'))
+            else:
+                with metrics.stage("parse_dates", rows=len(df)):
+                    df = parse_dates(df, 'EventTime')
+
+            # Check if concurrency is enabled
+            if args.concurrency:
+                if 'TimeGroup' not in df.columns:
+                    # Prompt for TimeGroup unit if it does not exist
+                    timegroup_unit = answers.get('timegroup_unit') or get_timegroup_unit()
+                    with metrics.stage("create_timegroup", rows=len(df)):
+                        df, _ = create_timegroup(df, 'EventTime', timegroup_unit)
+
+        return df
+
+    if args.cache_dir:
+        # The file is only read and preprocessed when the cache has no entry for it
+        df = CachedInput(args.input, load_input, args.cache_dir, options={'concurrency': args.concurrency, **answers})
     else:
-        df = parse_dates(df, 'EventTime')
+        df = load_input()
 
-    # Check if concurrency is enabled
-    if args.concurrency:
-        if 'TimeGroup' not in df.columns:
-            # Prompt for TimeGroup unit if it does not exist
-            timegroup_unit = get_timegroup_unit()
-            df = create_timegroup(df, 'EventTime', timegroup_unit)
+    if args.workers:
+        workers = args.workers
+    elif args.concurrency:
+        workers = cpu_count() or 1
+    else:
+        workers = 1
+
+    result_cache = ResultCache(args.result_cache, args.result_cache_size * 2**20) if args.result_cache else None
+    incremental = IncrementalMiner(args.incremental, args.border_ratio) if args.incremental else None
+
+    # Spilled levels are only needed until the CSVs are written
+    if args.spill_dir:
+        makedirs(args.spill_dir, exist_ok=True)
+    with TemporaryDirectory(dir=args.spill_dir) if args.spill_dir else nullcontext() as spill_dir:
+        # Execute the tool with the provided arguments
+        execute_tool(df, support_thresholds, categories, args.mode, args.output, engine=args.engine, counting=args.counting, workers=workers, department_workers=args.department_workers,
+                     shared_mining=not args.independent_thresholds, result_cache=result_cache,
+                     incremental=incremental, metrics=metrics, max_length=args.max_length, candidate_batch=args.candidate_batch,
+                     spill_dir=spill_dir, top_k=args.top_k, patterns=args.patterns, min_gap=args.min_gap, max_gap=args.max_gap, window=args.window,
+                     enrollment_filters=enrollment_filters)
+
+def time_prompt_answers(file_path, stream, concurrency, sample_rows=1000):
+    """
+    Ask the time prompts of preprocessing without loading the whole file: the time column (detected on a
+    sample of rows), the order of a semester column (read alone) and the time group unit.
 
-    # Execute the tool with the provided arguments
-    execute_tool(df, support_thresholds, categories, args.mode, args.output)
+    Returns:
+        dict: The answers given, keyed by time_column, semester_order and timegroup_unit.
+    """
+    answers = {}
+    columns = pd.read_csv(file_path, nrows=0).columns
+    if not stream and 'EventTime' not in columns:
+        answers['time_column'] = choose_time_column(pd.read_csv(file_path, nrows=sample_rows))
+        if answers['time_column'].lower() == 'semester':
+            semesters = pd.read_csv(file_path, usecols=[answers['time_column']])[answers['time_column']]
+            answers['semester_order'] = get_ordering(semesters.unique())
+    if concurrency and 'TimeGroup' not in columns:
+        answers['timegroup_unit'] = get_timegroup_unit()
+    return answers
 
 if __name__ == "__main__":
     main()
@@ -1,66 +1,60 @@
 from os import path, getcwd
 import pandas as pd
-from utils import get_data_dictionary
+from utils import get_data_dictionary, filter_enrollments
+from sequence_db import SequenceDatabase
+from streaming import CsvSource
+from sequence_cache import CachedInput
 
-def dataframe_gen(df, departments, run_mode, department_folder, is_course_data):
+def dataframe_gen(df, departments, run_mode, department_folder, is_course_data, enrollment_filters=None):
     """
     Generate a DataFrame from the input CSV file and filter based on departments and run mode.
 z
     Args:
-        df (DataFrame): The input DataFrame.
+        df (DataFrame, CsvSource or CachedInput): The input DataFrame, a CSV file to stream in chunks, or an input
+            whose encoded sequences are cached between runs.
         departments (list): List of department codes to filter.
         run_mode (str): Run mode, either "separate" or "together."
         department_folder (str): Directory where department-specific files will be stored.
+        enrollment_filters (dict): Grade and credit predicates, and grade bucket tagging, applied to the rows along
+            with the department filter (see `filter_enrollments`), so only the rows kept are encoded and cached.
 
     Returns:
         dict or tuple: Results based on run mode, either a dictionary for separate departments or a tuple for all together.
+        The sequence databases are deduplicated: students following the same path share one weighted sequence.
+        Their term times are ranked into periods (see `SequenceDatabase.rank_times`) for the time constraints.
     """
     def process_department_data(df, department_folder):
-        """Process the data specific to a department, including sorting and resetting the index."""
-        df = df.reset_index(drop=True)
-
-        '''
-        # assume TermOrder format is 'YYYYX' where X is the semester number
-        df['Year'] = df['TimeGroup'].astype(str).str[:-1].astype(int)  # Extract the year
-        df['Semester'] = df['TimeGroup'].astype(str).str[-1].astype(int)  # Extract the semester digit
-        '''
-
-        # sort by Year first, then Semester, and finally CourseCode
-        sorted_df = df.sort_values(by=['Year', 'Semester', 'Item'], ascending=[True, True, True])
-        # Now, we can do operations like filtering by year or grouping by semester
-        
-        # Group by ID, collecting the CourseCode and TermOrder sequences
-        sorted_df = sorted_df.groupby(['ID']).agg({
-            'Item': lambda x: list(x),
-            'TimeGroup': lambda x: list(x),
-        }).reset_index()
-
-        sorted_df = sorted_df.drop(columns=['ID'])
-
-        # calculate transactions and insert delimiters
-        transactions = len(sorted_df.index) + 1
-        delimitor_df = insert_delimitor(sorted_df, department_folder)
-
-        return transactions, sorted_df, delimitor_df
-
-    def process_general_data(df, department_folder):
-        df = df.reset_index(drop=True)
-        sorted_df = df.sort_values(by="TimeGroup")
-        sorted_df = df.groupby('ID').agg({
-            'Item': lambda x: list(x), 
-            'TimeGroup': lambda x: list(x),
-        }).reset_index()
-        sorted_df = sorted_df.drop(columns=['ID'])
-
-        transactions = len(sorted_df.index) + 1
-        delimitor_df = insert_delimitor(sorted_df, department_folder)
-
-        return transactions, sorted_df, delimitor_df
-
-    df = df.loc[df['Item'].str[:4].isin(departments)]
+        """Encode the data specific to a department into a sequence database, one sequence per distinct student path."""
+        # encode the sequences, then count the students encoded (rows without a time group are dropped), as
+        # the streamed and cached inputs do
+        sequence_db = insert_delimitor(df, department_folder).rank_times().deduplicate()
+        transactions = sequence_db.total_weight() + 1
+
+        return transactions, sequence_db
+
+    if isinstance(df, CachedInput):
+        key = df.key(departments, run_mode, is_course_data, enrollment_filters)
+        data = df.load_databases(key, departments, department_folder)
+        if data is None:
+            data = dataframe_gen(df.load(), departments, run_mode, department_folder, is_course_data, enrollment_filters)
+            df.save_databases(key, data, department_folder)
+        return data
+
+    if isinstance(df, CsvSource):
+        # The streamed file is filtered and encoded chunk by chunk, without building a DataFrame
+        separate = is_course_data and run_mode == "separate"
+        databases = df.sequence_databases(departments, separate, enrollment_filters)
+        for sequence_db in databases.values():
+            export_transactions(sequence_db, department_folder)
+        databases = {group: sequence_db.rank_times().deduplicate() for group, sequence_db in databases.items()}
+        if separate:
+            return {department: (sequence_db.total_weight() + 1, sequence_db) for department, sequence_db in databases.items()}
+        return databases[None].total_weight() + 1, databases[None]
+
+    df = filter_enrollments(df, enrollment_filters, df['Item'].str[:4].isin(departments))
 
     if not is_course_data:
-        return process_general_data(df, department_folder)
+        return process_department_data(df, department_folder)
     elif run_mode == "separate":
         results = {}
         for department in departments:
@@ -72,54 +66,25 @@ z
 
 def insert_delimitor(df, department_folder):
     """
-    Insert delimiters between different semesters in the course code.
+    Encode the course rows into a sequence database, with a new term wherever the semester (TimeGroup) changes.
+    The delimited string form (e.g. "MATH1001,CHEM1101|PHYS1501") is exported to transactions_delimiter.csv.
 
     Args:
-        df (DataFrame): The DataFrame containing the course codes.
+        df (DataFrame): The DataFrame containing one row per course taken, with ID, Item and TimeGroup columns.
         department_folder (str): Directory where department-specific files will be stored.
 
     Returns:
-        list: List of course codes with inserted delimiters.
+        SequenceDatabase: Encoded sequences, one per student.
     """
-    course = [str(i).strip("[]").split(", ") for i in df.Item]
-    semester = [str(i).strip("[]").split(", ") for i in df.TimeGroup]
+    sequence_db = SequenceDatabase.from_frame(df)
+    export_transactions(sequence_db, department_folder)
+
+    return sequence_db
 
-    K_itemset = []
-    updated_elem1 = []
-    part1 = " "
-    
-    for i in range(len(semester)):
-        start = 0
-        elem1 = course[i]
-        term1 = semester[i]
-        item = term1[0]
-        if len(term1) == 1:
-            # only one course
-            K_itemset.append(elem1[0])
-        else:
-            # all courses in same semester
-            if len(set(term1)) == 1:
-                part1 = ','.join(elem1)
-                updated_elem1.append(part1)
-            else:
-                for j in range(0, len(term1)-1):
-                    item1 = float(term1[j])
-                    item2 = float(term1[j+1])
-                    if item1 < item2:
-                        part1 = ','.join(elem1[start:j+1])
-                        start = j + 1
-                        updated_elem1.append(part1)
-                part1 = ','.join(elem1[start:len(elem1)])
-                updated_elem1.append(part1)
-                
-            item = '|'.join(updated_elem1)
-            K_itemset.append(item)
-            updated_elem1.clear()
-    
-    d = {'Item': K_itemset}
+def export_transactions(sequence_db, department_folder):
+    """Export the delimited string form of every sequence to transactions_delimiter.csv."""
+    d = {'Item': sequence_db.to_strings()}
     new_df = pd.DataFrame(d)
-    
+
     transactions_delimiter_file_path = path.join(department_folder, 'transactions_delimiter.csv')
     new_df.to_csv(transactions_delimiter_file_path)
-    
-    return(K_itemset) 
\ No newline at end of file
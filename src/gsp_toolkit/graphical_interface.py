@@ -6,6 +6,7 @@ import tkinter as tk
 from tkinter import filedialog, ttk
 import pandas as pd
 from gsp_algorithm import execute_tool, set_course_data
+from result_cache import ResultCache
 from utils import ToolTip, get_data_dictionary, preprocess_time, get_timegroup_unit, create_timegroup, parse_dates
 from os import path, makedirs
 
@@ -15,10 +16,12 @@ class GSPTool:
         self.file_df = None
         self.results = None
         self.is_course_data = True
-        self.concurrent_var = tk.IntVar()  # Future option for toggling concurrency
+        self.concurrent_var = tk.IntVar()  # Count supports over all cores when set
         output_path = path.join(path.dirname(__file__), '..', '..', 'output')
         makedirs(path.dirname(output_path), exist_ok=True)
         self.output_directory = output_path
+        # Repeated runs with the same data and settings are served from the mined results of earlier ones
+        self.result_cache = ResultCache(path.join(path.dirname(__file__), '..', '..', 'data', 'result_cache'))
         self.input_file_name = tk.StringVar()
         self.min_supports = []
         self.categories = set()
@@ -212,7 +215,8 @@ class GSPTool:
             self.progress.start()
 
             try:
-                self.results = execute_tool(self.file_df, min_supports, selected_categories, run_mode_var, self.output_directory)
+                self.results = execute_tool(self.file_df, min_supports, selected_categories, run_mode_var, self.output_directory, workers=workers,
+                                            result_cache=self.result_cache)
             finally:
                 self.progress.stop()
                 self.progress.grid_forget()
@@ -231,6 +235,7 @@ class GSPTool:
             min_supports_str = self.min_supports_entry.get()
             min_supports = [int(s) for s in min_supports_str.split(",")]
             run_mode_var = self.run_mode_var.get()
+            workers = (os.cpu_count() or 1) if self.concurrent_var.get() else 1
             threading.Thread(target=target).start()
 
 if __name__ == "__main__":
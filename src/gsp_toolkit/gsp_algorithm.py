@@ -1,9 +1,21 @@
 from os import path, makedirs
 import time
 from collections import defaultdict
+from heapq import heappush, heappushpop
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from multiprocessing import Manager
 from datetime import datetime
 from data_processing import dataframe_gen
 from utils import filter_and_export_to_csv, export_summary_to_file, generate_hash
+from sequence_db import is_subsequence, TimeConstraints
+from hash_tree import CandidateHashTree
+from spade import spade_algorithm
+from prefixspan import prefixspan_algorithm
+from parallel import ShardedCounter
+from metrics import RunMetrics, peak_memory_mb
+from spill import SpilledResults
 
 is_course_data = True
 
@@ -12,148 +24,62 @@ def set_course_data(value):
     global is_course_data
     is_course_data = value
 
+def drop_first_item(itemset):
+    """Return the itemset without the first item of its first block."""
+    if len(itemset[0]) == 1:
+        return itemset[1:]
+    return (itemset[0][1:],) + itemset[1:]
+
+def drop_last_item(itemset):
+    """Return the itemset without the last item of its last block."""
+    if len(itemset[-1]) == 1:
+        return itemset[:-1]
+    return itemset[:-1] + (itemset[-1][:-1],)
+
 def join_itemsets(itemset):
     """
     Perform the join operation of the Apriori algorithm by comparing different itemsets.
 
+    Itemsets are indexed by their "drop-last-item" key, so each itemset only meets the itemsets whose
+    key equals its own "drop-first-item" key, instead of being compared with every other itemset.
+
     Args:
-        itemset (list): List of itemsets to join.
+        itemset (list): List of itemsets to join, each a tuple of blocks of item codes.
 
     Returns:
         list: List of joined itemsets.
     """
-    unionset = []
-    res = [i.strip("[]").split("|") for i in itemset]
-    res2 = [i.strip("[]").replace("|", ",").split(",") for i in itemset]
-
-    for i in range(len(res)):
-        element1 = res[i]
-        elem1 = res2[i]
-        total = len(element1)
-        for k in range(i+1, len(res)):     
-            element2 = res[k]
-            elem2 = res2[k]
-            index = 0
-            join_items = []
-            join_items2 = []
-            join_items3 = []
-            status = 0
-            sub_status = 0
-            if len(element1) == len(element2):
-                for j in range(len(element1)):
-                    block1 = element1[j]
-                    block1 = block1.strip("[]").split(",")
-                    block2 = element2[j]
-                    block2 = block2.strip("[]").split(",")
-                    
-                    if len(block1) == len(block2):
-                        if j == len(element1) -1:
-                            if block1[0:(len(block1)-1)] == block2[0:(len(block1)-1)]:
-                                index += 1
-                        else:    
-                            if block1[0:(len(block1))] == block2[0:(len(block1))]:
-                                index += 1
-                
-                # If number of matched blocks == number of total blocks, then perform join   
-                # Three Join Cases: 
-                # Case 1: a,b,c  -- a,b,d  --> a,b,c,d
-                # Case 2: a,b,c  -- a,b|d  --> a,b,c|d
-                # Case 3: a,b|c  -- a,b|d  --> a,b|c,d AND a,b,c|d AND a,b,d|c
-                           
-                if index == total: 
-                    block_items = []
-                    joined_block = []
-                    unsort_block = []
-                    
-                    #Example: 1000, 1100| 1200, 1300, 1400  -- 1000, 1100| 1200, 1300, 1600 --> 1000, 1100| 1200, 1300, 1400, 1600
-                    unsort_block.append(block1[-1])                  # Last item of itemset 1 - ex) 1400 
-                    unsort_block.append(block2[-1])                  # Last item of itemset 2 - ex) 1600
-                    sort_block = ','.join(sorted(unsort_block))      # Join together with ',' and sort - ex) 1400, 1600 
-                    
-                    list1 = '|'.join(element1[0: len(element1)-1])   # Join Element1 back together minus the last block -- ex) 1000, 1100
-                    join_items.append(list1)                         
-                    
-                    if len(block1) > 1:  # If the last block has multiple items ex) a| b, c 
-                        joined_block = ','.join(block1[0: len(block1)-1]) # Join the last block minus the last item -- ex) 1200, 1300
-                        block_items.append(joined_block)                  # Add last block to block_items
-                        
-                        
-                    block_items.append(sort_block)                 # Add the last two joined items to block_items
-                    final_block = ','.join(block_items)            # Join block_items with a comma -- ex) 1200, 1300, 1400, 1600
-                    
-                    join_items.append(final_block)                 
-                    result = '|'.join(join_items)                   # ex) -- 1000, 1100|1200, 1300, 1400, 1600
-                    
-                    unionset.append(result.rstrip(',').lstrip('|'))             # add to list of return items 
-                    
-                    
-                    # Case 2: last delimotor is '|'  ex) elem1: a, b | c  -- elem2: a, b | d 
-                    if len(block1) == 1:      # last block has only one item
-                        part1 = '|'.join(res[i])  # join together all of elem1
-                        join_items2.append(part1)  # add elem1 to join_items
-                        join_items2.append(block2[-1])  # single element of final block2
-                        result2 = '|'.join(join_items2) # result1 == a, b | c | d
-                        unionset.append(result2.rstrip(',').strip('"'))
-                    
-                        status = 1 
-                        sub_status = 1
-                       
-            # equal number of elements but different number of semesters 
-            # EX: itemset1: a, b, c | e   --- itemset2: a, b, c, d --- result: a, b, c, d | e 
-            elif len(elem1) == len(elem2) and (len(element1)-len(element2) == 1 or len(element2)-len(element1) == 1):
-                if len(element1) > len(element2):
-                    for j in range(len(element1)-1):   # all except last item/block
-                        block1 = element1[j]
-                        block1= block1.strip("[]").split(",")
-                        
-                        if index == (len(element1) -2):
-                            block2 = element2[j]
-                            block2= block2.strip("[]").split(",")
-                            if block1[0:(len(block1))] == block2[0:(len(block2)-1)]:
-                                block1 = element1[j+1]
-                                if block1 != block2[-1]:
-                                    index += 1                
-                        else:
-                            block2 = element2[j]
-                            block2= block2.strip("[]").split(",")
-                            if len(block1) == len(block2) and block1[0:(len(block1))] == block2[0:(len(block2))]:
-                                index += 1                    
-                    if index == len(element1)-1:
-                        status = 1
-                        sub_status = 1
-                        block1 = element1[-1].strip("[]").split(",")
-                # element2 = '1400|2000' AND element1 = '1400,1600' 
-                elif len(element2) > len(element1):
-                    for j in range(len(element2)-1):   # all except last item/block
-                        block1 = element2[j]
-                        block1= block1.strip("[]").split(",")
-                        if index == (len(element2) -2):
-                            block2 = element1[j]
-                            block2= block2.strip("[]").split(",")
-                            if block1[0:(len(block1))] == block2[0:(len(block2)-1)]:
-                                block1 = element2[j+1]
-                                if block1 != block2[-1]:
-                                    index += 1                
-                        else:
-                            block2 = element1[j]
-                            block2= block2.strip("[]").split(",")
-                            if len(block1) == len(block2) and block1[0:(len(block1))] == block2[0:(len(block2))]:
-                                index += 1                    
-                    if index == len(element2)-1:
-                        status = 1
-                        sub_status = 2
-                        block1 = element2[-1].strip("[]").split(",")    
-            # EX: itemset1: a, b, c | e   --- itemset2: a, b, c, d --- result: a, b, c, d | e 
-            if status == 1: 
-                if sub_status == 1:
-                    part2 = '|'.join(res[k])   # join together all of elem2 (a,b,c,d)
-                elif sub_status == 2:
-                    part2 = '|'.join(res[i])   # join together all of elem1
-                join_items3.append(part2)      # add elem2 to join2_items
-                join_items3.append(block1[-1]) # single element of final (e)
-                result3 = '|'.join(join_items3)  # (a,b,c,d|e)
-                unionset.append(result3.rstrip(',').strip('"'))
-    return unionset        
+    return list(generate_joins(itemset))
+
+def generate_joins(itemset):
+    """Yield the joined itemsets of `join_itemsets` one at a time, so a level's candidates can be processed in batches."""
+    # Single items: a -- b --> a,b AND a|b AND b|a (and a|a for a course taken in two semesters).
+    # The string-based join only ever produced a|b, for a before b in label order, so courses taken in the
+    # other order, or retaken, were never counted; both orders are GSP candidates and are mined on purpose.
+    if itemset and all(len(element) == 1 and len(element[0]) == 1 for element in itemset):
+        items = sorted(element[0][0] for element in itemset)
+        for item1 in items:
+            for item2 in items:
+                if item1 < item2:
+                    yield ((item1, item2),)
+                yield ((item1,), (item2,))
+        return
+
+    by_drop_last = defaultdict(list)
+    for element2 in itemset:
+        by_drop_last[drop_last_item(element2)].append(element2)
+
+    # Three Join Cases, joining element1 with every element2 whose drop-last key is element1's drop-first key:
+    # Case 1: a,b,c  -- b,c,d  --> a,b,c,d    (last item of element2 shares its block: same-semester extension)
+    # Case 2: a|b|c  -- b|c|d  --> a|b|c|d    (last item of element2 is alone in its block: new-semester extension)
+    # Case 3: a,b    -- b|c    --> a,b|c      (itemsets with different numbers of semesters)
+    for element1 in itemset:
+        for element2 in by_drop_last.get(drop_first_item(element1), ()):
+            last_item = element2[-1][-1]
+            if len(element2[-1]) == 1:
+                yield element1 + ((last_item,),)
+            else:
+                yield element1[:-1] + (element1[-1] + (last_item,),)
 
 
 def prune_candidates(count, minsupport):
@@ -173,137 +99,511 @@ def prune_candidates(count, minsupport):
             itemset.append(i)     
     return itemset
 
-def count_subset(candidate, length, df):
+def filter_results(results_dict, min_support):
+    """
+    Slice the itemsets meeting a minimum support out of results mined at a lower threshold. Support is
+    anti-monotone, so these are exactly the results of mining at `min_support`.
+
+    Args:
+        results_dict (dict): A dictionary containing frequent itemsets and their counts, by level.
+        min_support (float): Minimum support threshold, at least the one the results were mined at.
+
+    Returns:
+        dict: The levels and itemsets of `results_dict` meeting `min_support`.
+    """
+    if isinstance(results_dict, SpilledResults):
+        return results_dict.filtered(min_support)
+    filtered = {}
+    for level, itemset_count in results_dict.items():
+        frequent_itemsets = prune_candidates(itemset_count, min_support)
+        if frequent_itemsets:
+            filtered[level] = {itemset: itemset_count[itemset] for itemset in frequent_itemsets}
+    return filtered
+
+def prune_infrequent_subsequences(candidate_itemsets, frequent_itemsets, contiguous=False):
+    """
+    Apriori pruning: drop the candidates that have an infrequent subsequence. Removing any one item of a
+    frequent itemset must leave a frequent itemset, so a candidate that fails this check cannot be frequent
+    and is never counted.
+
+    Args:
+        candidate_itemsets (list): List of candidate itemsets of length k.
+        frequent_itemsets (set): Hashed set of the frequent itemsets of length k-1.
+        contiguous (bool): Only check the contiguous subsequences, those not dropping a block of a single item
+            between two others: under a max gap, dropping such a block can join blocks too far apart.
+
+    Returns:
+        list: The candidates whose (k-1)-subsequences are all frequent.
+    """
+    pruned = []
+    for candidate in candidate_itemsets:
+        for i, block in enumerate(candidate):
+            if contiguous and len(block) == 1 and 0 < i < len(candidate) - 1:
+                continue
+            for j in range(len(block)):
+                if len(block) == 1:
+                    subsequence = candidate[:i] + candidate[i+1:]
+                else:
+                    subsequence = candidate[:i] + (block[:j] + block[j+1:],) + candidate[i+1:]
+                if subsequence not in frequent_itemsets:
+                    break
+            else:
+                continue
+            break
+        else:
+            pruned.append(candidate)
+    return pruned
+
+def count_subset(candidate, sequence_db, time_constraints=None):
     """
     Count occurrences of candidate subsets in the data.
 
     Args:
         candidate (list): List of candidate itemsets.
-        length (int): Length of the itemsets.
-        df (DataFrame): DataFrame containing the data.
+        sequence_db (SequenceDatabase): Encoded sequence database.
+        time_constraints (TimeConstraints): If given, only the occurrences within the constraints are counted.
 
     Returns:
         dict: Dictionary containing the count of occurrences for each candidate subset.
     """
     Lk = defaultdict(int)
-    res = [i.split("|") for i in df]
-    candidate_set = [i.replace(" ","").split("|")  for i in candidate]   
-   
-    for row in range(len(res)):
-        data = res[row] 
-        for item in range(0, length):         
-            item1 = candidate_set[item]                         
-            z = 0 
-            counter = 0
-            if len(data) >= len(item1):
-                for i in range(len(item1)):        
-                    block1= item1[i]                
-                    block1 = block1.split(",")
-                    for j in range(z, len(data)):   
-                        block2 = data[j]
-                        block2 = block2.split(",")
-                        if len(block2) >= len(block1):
-                            w = 0
-                            sub_counter = 0
-                            for k in range(len(block1)):
-                                for l in range(w, len(block2)):
-                                    if block1[k] == block2[l]:
-                                        sub_counter += 1
-                                        if w != len(block2):
-                                            w = l + 1
-                                        break
-                            if sub_counter == len(block1):
-                                counter +=1 
-                                if z != len(data):
-                                    z = j + 1 
-                                break
-                if counter == len(item1):
-                    key = (candidate[item])
-                    Lk[key] +=1
-    return Lk                
-                            
-def apriori_algorithm(candidate_itemsets, min_support, k_value, dataframe): 
+
+    if time_constraints is not None:
+        for data, weight, times in zip(sequence_db.sequences, sequence_db.sequence_weights().tolist(), sequence_db.term_times):
+            for item1 in candidate:
+                if len(data) >= len(item1) and time_constraints.contains(item1, data, times):
+                    Lk[item1] += weight
+        return Lk
+
+    for data, weight in zip(sequence_db.sequences, sequence_db.sequence_weights().tolist()):
+        for item1 in candidate:
+            if len(data) >= len(item1) and is_subsequence(item1, data):
+                Lk[item1] += weight
+    return Lk
+
+def count_candidates(candidate_itemsets, sequence_db, counting="hashtree", time_constraints=None):
+    """
+    Count the candidates of one level with the selected counting backend.
+
+    Args:
+        candidate_itemsets (list): List of candidate itemsets.
+        sequence_db (SequenceDatabase): Encoded sequence database.
+        counting (str): "hashtree" to check each sequence only against the candidates it can contain,
+            or "scan" for the original scan of every sequence against every candidate.
+        time_constraints (TimeConstraints): If given, a candidate is only counted in the sequences where it occurs
+            within the constraints, using the term times of the database.
+
+    Returns:
+        dict: Dictionary containing the count of occurrences for each candidate.
+    """
+    if counting == "hashtree":
+        weights = None if sequence_db.weights is None else sequence_db.weights.tolist()
+        times = None if time_constraints is None else sequence_db.term_times
+        return CandidateHashTree(candidate_itemsets, time_constraints=time_constraints).count(sequence_db.sequences, weights, times)
+    elif counting == "scan":
+        return count_subset(candidate_itemsets, sequence_db, time_constraints)
+    else:
+        raise ValueError(f"Unsupported counting engine: {counting}")
+
+def candidate_batches(candidate_itemsets, batch_size=None):
+    """Split candidates (a list or a generator) into lists of at most `batch_size`, or a single list without a batch size."""
+    if batch_size is None:
+        candidate_itemsets = list(candidate_itemsets)
+        if candidate_itemsets:
+            yield candidate_itemsets
+        return
+    candidate_itemsets = iter(candidate_itemsets)
+    while batch := list(islice(candidate_itemsets, batch_size)):
+        yield batch
+
+def support_bound_batches(candidate_itemsets, bounds, first_size):
+    """Split candidates in two batches, the `first_size` with the highest support bound in ``bounds``, then the others."""
+    candidate_itemsets = sorted(candidate_itemsets, key=bounds.__getitem__, reverse=True)
+    yield candidate_itemsets[:first_size]
+    if candidate_itemsets[first_size:]:
+        yield candidate_itemsets[first_size:]
+
+def apriori_algorithm(candidate_itemsets, min_support, k_value, sequence_db, *, counting="hashtree", workers=1, level_stats=None, metrics=None,
+                      max_length=None, candidate_batch=None, spill_dir=None, top_k=None, reduce_database=True, time_constraints=None):
     """
     Runs the Apriori algorithm to determine frequent itemsets.
 
     Args:
         candidate_itemsets (list): List of candidate itemsets.
         min_support (float): Minimum support threshold.
-        k_value (int): The current size of the itemsets being processed.
-        dataframe (pd.DataFrame): The DataFrame containing the transaction data.
+        k_value (int): The current size of the itemsets being processed. Candidates of a first level above 2 are
+            counted without subsequence pruning, as no level below them has been counted.
+        sequence_db (SequenceDatabase): Encoded sequence database.
+        counting (str): Counting backend, "hashtree" or "scan" (see `count_candidates`).
+        workers (int): Number of processes counting shards of students in parallel at each level.
+        level_stats (list): If given, a dict per level is appended with the number of candidates generated,
+            pruned before counting, and found frequent, the number of sequences and items they were counted
+            over, the wall time of the level and the peak memory so far, with that of the counting workers when
+            `workers` is above 1.
+        metrics (RunMetrics): If given, each level's statistics are also recorded as a "level" record as soon
+            as the level is done.
+        max_length (int): Longest itemsets mined, in items; the loop stops after that level.
+        candidate_batch (int): Largest number of candidates generated, pruned and counted at once. Each batch is
+            a pass over the database, and only its frequent itemsets are kept, so a level's candidates and counts
+            are never all in memory together. The itemsets of a level come out batch by batch, so in another order.
+        spill_dir (str): If given, each level is written to disk as soon as it is complete (see `SpilledResults`),
+            keeping only the last level's frequent itemsets in memory to join the next.
+        top_k (int): If given, only the `top_k` most frequent itemsets are mined, `min_support` being a floor. The
+            support is raised to the k-th highest count found so far after every batch, so later levels (and
+            batches) are pruned with it; itemsets tied with the k-th count are all kept. Unless `candidate_batch`
+            is given, the first level is counted in two batches: the candidates of the most frequent items, which
+            raise the support, then only the others that can still reach it.
+        reduce_database (bool): After each level, strip the items that are in no frequent itemset of the level,
+            and the sequences left too short for the next one (see `SequenceDatabase.reduce`), and collapse the
+            sequences made identical, so every level is counted over a smaller database.
+        time_constraints (TimeConstraints): If given, itemsets are counted only where they occur within the constraints,
+            and with a max gap candidates are only pruned with their contiguous subsequences.
 
     Returns:
         dict: A dictionary containing frequent itemsets and their counts.
     """
-    results_dict = {}
-    
-    while candidate_itemsets:                                         
-        column_name = f"Freq {k_value}-Itemsets"
-        itemset_count = count_subset(candidate_itemsets, len(candidate_itemsets), dataframe)               
-        frequent_itemsets = prune_candidates(itemset_count, min_support)
-        candidate_itemsets = join_itemsets(frequent_itemsets) 
-
-        if candidate_itemsets:                                  
-            results_dict[column_name] = itemset_count
-        
-        k_value += 1
-    
+    results_dict = SpilledResults.create(spill_dir) if spill_dir is not None else {}
+    top_counts = []
+    counter = ShardedCounter(sequence_db, workers, counting, time_constraints) if workers > 1 and candidate_itemsets else None
+    contiguous = time_constraints is not None and time_constraints.max_gap is not None
+
+    # Frequent itemsets of the level before, to prune candidates with; none before a level has been counted
+    frequent_set = None
+
+    try:
+        # A level's time covers generating its candidates (the join at the end of the previous level), pruning and counting them
+        level_start = time.perf_counter()
+        while max_length is None or k_value <= max_length:
+            column_name = f"Freq {k_value}-Itemsets"
+            generated = 0
+            counted = 0
+            frequent_count = {}
+            bounds = None
+            if top_k is not None and k_value == 2 and candidate_batch is None:
+                # An itemset is in no more sequences than its least frequent item, so the candidates with the highest
+                # such bound are counted first, and those left whose bound is below the raised support are skipped
+                item_supports = sequence_db.item_supports()
+                bounds = {itemset: min(item_supports[item] for term in itemset for item in term) for itemset in candidate_itemsets}
+                batches = support_bound_batches(candidate_itemsets, bounds, max(top_k, len(candidate_itemsets) // 8))
+            else:
+                batches = candidate_batches(candidate_itemsets, candidate_batch)
+            for batch in batches:
+                generated += len(batch)
+                if frequent_set is not None:
+                    batch = prune_infrequent_subsequences(batch, frequent_set, contiguous)
+                elif bounds is not None:
+                    batch = [itemset for itemset in batch if bounds[itemset] >= min_support]
+                if not batch:
+                    continue
+                counted += len(batch)
+
+                if counter:
+                    itemset_count = counter.count(batch)
+                else:
+                    itemset_count = count_candidates(batch, sequence_db, counting, time_constraints)
+                for itemset in prune_candidates(itemset_count, min_support):
+                    frequent_count[itemset] = itemset_count[itemset]
+                    if top_k is not None:
+                        if len(top_counts) < top_k:
+                            heappush(top_counts, itemset_count[itemset])
+                        else:
+                            heappushpop(top_counts, itemset_count[itemset])
+                if top_k is not None and len(top_counts) == top_k:
+                    min_support = max(min_support, top_counts[0])
+            if not generated:
+                break
+
+            if top_k is not None:
+                frequent_count = {itemset: count for itemset, count in frequent_count.items() if count >= min_support}
+
+            frequent_itemsets = list(frequent_count)
+            frequent_set = set(frequent_itemsets)
+
+            if level_stats is not None or metrics is not None:
+                stats = {
+                    "level": k_value,
+                    "candidates": generated,
+                    "pruned": generated - counted,
+                    "frequent": len(frequent_itemsets),
+                    "sequences": len(sequence_db),
+                    "items": len(sequence_db.items),
+                    "seconds": round(time.perf_counter() - level_start, 6),
+                    "peak_memory_mb": peak_memory_mb(),
+                }
+                if counter:
+                    stats["workers_peak_memory_mb"] = counter.peak_memory_mb
+                if level_stats is not None:
+                    level_stats.append(stats)
+                if metrics is not None:
+                    metrics.record("level", **stats)
+
+            level_start = time.perf_counter()
+            if reduce_database and frequent_itemsets:
+                # The (k+1)-candidates are joined from the frequent k-itemsets, so they hold no other item
+                keep_items = {item for itemset in frequent_itemsets for term in itemset for item in term}
+                sequence_db = sequence_db.reduce(keep_items, k_value + 1)
+                if counter:
+                    counter.reduce(keep_items, k_value + 1)
+                else:
+                    # Sequences that differed only by stripped items are counted once again
+                    sequence_db = sequence_db.deduplicate()
+
+            if candidate_batch is None:
+                candidate_itemsets = join_itemsets(frequent_itemsets)
+            else:
+                candidate_itemsets = generate_joins(frequent_itemsets)
+
+            if frequent_itemsets:
+                if spill_dir is not None:
+                    results_dict.write(column_name, frequent_count)
+                else:
+                    results_dict[column_name] = frequent_count
+
+            k_value += 1
+    finally:
+        if counter:
+            counter.close()
+
+    if top_k is not None:
+        # Earlier levels were kept at the support of their time
+        return filter_results(results_dict, min_support)
     return results_dict
 
-def run_apriori_on_data(df, new_df, transactions, minsupport, department_folder, department_name, start_time, output_path):
+def mine_sequences(sequence_db, min_support, engine="gsp", counting="hashtree", workers=1, level_stats=None, metrics=None,
+                   max_length=None, candidate_batch=None, spill_dir=None, top_k=None, patterns="all", reduce_database=True,
+                   min_gap=None, max_gap=None, window=None):
+    """
+    Mine the frequent sequences of two or more items with the selected engine.
+
+    Args:
+        sequence_db (SequenceDatabase): Encoded sequence database.
+        min_support (float): Minimum support threshold.
+        engine (str): "gsp" for the level-wise Apriori loop, "spade" for vertical id-list joins, or "prefixspan"
+            for pattern growth over projected databases.
+        counting (str): Counting backend of the "gsp" engine, "hashtree" or "scan" (see `count_candidates`).
+        workers (int): Number of processes the "gsp" engine counts with.
+        level_stats (list): Per-level candidate statistics of the "gsp" engine (see `apriori_algorithm`).
+        metrics (RunMetrics): Receives the per-level records of the "gsp" engine as the levels complete.
+        max_length (int): Longest sequences mined, in items. Default: no limit.
+        candidate_batch (int): Candidates the "gsp" engine counts at once (see `apriori_algorithm`). Default: a whole level.
+        spill_dir (str): Directory the results are written to level by level and read back from (see `SpilledResults`).
+            The "gsp" engine spills each level as it completes; the depth-first engines once the search is done.
+        top_k (int): Mine the `top_k` most frequent sequences of at least `min_support` instead of all of them, raising the
+            support as they are found (see `apriori_algorithm`). Only the "gsp" engine supports it.
+        patterns (str): "all" frequent sequences, or only the "closed" (no super-sequence with the same support) or "maximal"
+            (no frequent super-sequence) ones, pruned during the search. Only the "prefixspan" engine supports the latter.
+        reduce_database (bool): Strip the infrequent items and the sequences left with a single item before mining, and,
+            with the "gsp" engine, shrink the database after every level (see `apriori_algorithm`). Default: True.
+        min_gap (float): Consecutive terms of a sequence must be more than `min_gap` periods apart (see `TimeConstraints`).
+        max_gap (float): Consecutive terms of a sequence must be at most `max_gap` periods apart, e.g. 2 for courses taken
+            within 2 semesters of each other.
+        window (float): The items of one term of a sequence may be taken up to `window` periods apart.
+            The time constraints are enforced while counting, and need the term times of the database; only the "gsp"
+            engine supports them. Default: None (no constraint).
+
+    Returns:
+        dict: A dictionary containing frequent itemsets and their counts, by level.
+    """
+    if top_k is not None and engine != "gsp":
+        raise ValueError(f"Top-k mining is not supported by the {engine} engine")
+    if patterns != "all" and engine != "prefixspan":
+        raise ValueError(f"Mining {patterns} patterns is not supported by the {engine} engine")
+
+    time_constraints = None
+    if min_gap or max_gap is not None or window:
+        if engine != "gsp":
+            raise ValueError(f"Time constraints are not supported by the {engine} engine")
+        if sequence_db.times is None:
+            raise ValueError("Time constraints need the term times of the sequence database")
+        time_constraints = TimeConstraints(min_gap, max_gap, window)
+    else:
+        # Without constraints, sequences differing only by their term times are the same
+        sequence_db = sequence_db.without_times()
+
+    freq_singles = prune_candidates(sequence_db.item_supports(), min_support)
+    if reduce_database:
+        # An infrequent item is in no frequent sequence, and a sequence of a single item holds none of two or more
+        sequence_db = sequence_db.reduce(freq_singles, 2).deduplicate()
+
+    if engine == "gsp":
+        singles = [((item,),) for item in freq_singles]
+        Ck = join_itemsets(singles) if candidate_batch is None else generate_joins(singles)
+        return apriori_algorithm(
+            Ck, min_support, 2, sequence_db, counting=counting, workers=workers, level_stats=level_stats, metrics=metrics, max_length=max_length,
+            candidate_batch=candidate_batch, spill_dir=spill_dir, top_k=top_k, reduce_database=reduce_database, time_constraints=time_constraints
+        )
+    elif engine == "spade":
+        results_dict = spade_algorithm(sequence_db, min_support, max_length)
+    elif engine == "prefixspan":
+        results_dict = prefixspan_algorithm(sequence_db, min_support, max_length, patterns)
+    else:
+        raise ValueError(f"Unsupported mining engine: {engine}")
+
+    if spill_dir is None:
+        return results_dict
+    spilled = SpilledResults.create(spill_dir)
+    for level in sorted(results_dict, key=lambda level: int(level.split()[1].split('-')[0])):
+        spilled.write(level, results_dict.pop(level))
+    return spilled
+
+def run_apriori_on_data(sequence_db, transactions, minsupport, department_folder, department_name, start_time, output_path, mining_options=None, summary_lock=None, mined_results=None, level_stats=None):
     """
     Run the Apriori algorithm on the given data and export the results.
 
     Args:
-        df (pd.DataFrame): The original DataFrame containing the data.
-        new_df (pd.DataFrame): The DataFrame after preprocessing.
+        sequence_db (SequenceDatabase): Encoded sequence database built by `dataframe_gen`.
         transactions (int): Total number of transactions in the data.
         minsupport (float): Minimum support value for the Apriori algorithm.
         department_folder (str): The directory where the results will be stored.
         department_name (str): The name of the department being processed.
         start_time (float): The start time for measuring runtime.
         output_path (str): The path to store the output file.
+        mining_options (dict): Keyword options for `mine_sequences`, e.g. the engine.
+        summary_lock (Lock): Lock held while appending to Export.txt when several workers share it.
+        mined_results (dict): Results already mined at a lower or equal min support; when given they are
+            sliced with `filter_results` instead of mining again.
+        level_stats (list): Receives the per-level candidate statistics when mining (see `apriori_algorithm`).
 
     Returns:
         tuple: A tuple containing the name of the exported CSV file, the results dictionary, and the runtime.
     """
-    k = 2
-
-    single_count = defaultdict(int)
-    set_count = defaultdict(int)
-    df['Item'] = df['Item'].astype(str)
-    row = [i.strip("[]").replace(", ", ",").split(",") for i in df['Item']]
-
-    for i in range(len(row)):
-        elem = row[i]
-        key = len(row[i])
-        set_count[key] += 1
-        for item in range(len(elem)):
-            single_count[elem[item]] += 1
-
-    freq_singles = prune_candidates(single_count, minsupport)
-    Ck = join_itemsets(freq_singles)
+    single_count = sequence_db.item_supports()
 
     department_hash = generate_hash(department_name + str(minsupport))
     export_file_name = f"{department_hash}_{minsupport}.csv"
 
-    department_export_dict = apriori_algorithm(Ck, minsupport, k, new_df)
+    if mined_results is None:
+        mined_results = mine_sequences(sequence_db, minsupport, level_stats=level_stats, **(mining_options or {}))
+    else:
+        mined_results = filter_results(mined_results, minsupport)
+
+    if isinstance(mined_results, SpilledResults):
+        department_export_dict = mined_results.decoded(sequence_db.labels)
+    else:
+        department_export_dict = sequence_db.decode_results(mined_results)
     k_count = filter_and_export_to_csv(department_export_dict, minsupport, transactions, path.join(department_folder, export_file_name))
     session = (time.time() - start_time)
-    export_summary_to_file(single_count, k_count, transactions, session, path.join(output_path, 'Export.txt'))
+    single_count = {sequence_db.labels[item]: count for item, count in single_count.items()}
+    with summary_lock or nullcontext():
+        export_summary_to_file(single_count, k_count, transactions, session, path.join(output_path, 'Export.txt'))
 
     return export_file_name, department_export_dict, session
 
-def run_separate_mode(departments, min_supports, input_df, output_path, run_mode_var):
+def run_thresholds_on_data(sequence_db, transactions, min_supports, department_folder, department_name, output_path, *, mining_options=None, summary_lock=None, shared_mining=True, result_cache=None, incremental=None, metrics=None):
+    """
+    Run every min support on one dataset. With `shared_mining`, the data is mined once at the lowest min
+    support and each threshold's CSV and summary are sliced out of that result.
+
+    Args:
+        sequence_db (SequenceDatabase): Encoded sequence database built by `dataframe_gen`.
+        transactions (int): Total number of transactions in the data.
+        min_supports (list): List of minimum support values.
+        department_folder (str): The directory where the results will be stored.
+        department_name (str): The name of the department being processed.
+        output_path (str): The path to store the output file.
+        mining_options (dict): Keyword options for `mine_sequences`, e.g. the engine.
+        summary_lock (Lock): Lock held while appending to Export.txt when several workers share it.
+        shared_mining (bool): Mine once at the lowest min support instead of once per min support.
+        result_cache (ResultCache): Cache of mined results; mining is skipped when it holds results mined
+            at or below the min support needed.
+        incremental (IncrementalMiner): Keeps the results of the dataset across runs, updating them with the
+            changed sequences only instead of mining from scratch.
+        metrics (RunMetrics): Receives a "mine" stage per mining run, with its levels, and an "export" stage per min support.
+
+    Returns:
+        list: One (min support, export file name, results dictionary, runtime, min support mined at, level stats,
+        source) tuple per min support, the source describing where cached, updated or top-k results came from;
+        the thresholds derived from a shared run share its mining time and level stats. A top-k run has a
+        single outcome, at the support of its k-th sequence.
+    """
+    outcomes = []
+    if metrics is not None:
+        metrics = metrics.bind(department=department_name)
+    threshold_groups = [min_supports] if shared_mining and len(min_supports) > 1 else [[minsupport] for minsupport in min_supports]
+
+    for thresholds in threshold_groups:
+        lowest_support = min(thresholds)
+        level_stats = []
+        level_metrics = metrics.bind(min_support=lowest_support) if metrics is not None else None
+        mining_start = time.time()
+
+        source = None
+        cached = result_cache.get(sequence_db, lowest_support, mining_options) if result_cache is not None else None
+        if cached is not None:
+            mined_results, mined_support = cached
+            source = "Served from Result Cache"
+        else:
+            if incremental is not None:
+                mined_results, changed = incremental.mine(sequence_db, lowest_support, department_name, mining_options, level_stats, level_metrics)
+                if changed is not None:
+                    source = f"Incremental Update: {changed} Sequences Added or Removed"
+            else:
+                mined_results = mine_sequences(sequence_db, lowest_support, level_stats=level_stats, metrics=level_metrics, **(mining_options or {}))
+            mined_support = lowest_support
+            if result_cache is not None:
+                result_cache.put(sequence_db, lowest_support, mining_options, mined_results)
+        mining_time = time.time() - mining_start
+
+        top_k = (mining_options or {}).get("top_k")
+        if top_k is not None:
+            # The min support of a top-k run is the k-th highest count, only known once mined
+            lowest_support = mined_support = float(max(lowest_support, min((count for itemset_count in mined_results.values() for count in itemset_count.values()), default=lowest_support)))
+            thresholds = [lowest_support]
+            source = ', '.join(filter(None, (source, f"Top {top_k} Sequences")))
+
+        if metrics is not None:
+            metrics.record("stage", stage="mine", min_support=lowest_support, seconds=round(mining_time, 6), sequences=len(sequence_db), students=sequence_db.total_weight(),
+                           patterns=sum(len(itemset_count) for itemset_count in mined_results.values()), source=source)
+
+        for minsupport in thresholds:
+            start_time = time.time()
+            if minsupport == lowest_support:
+                start_time -= mining_time
+                mining_time = 0
+
+            with metrics.stage("export", min_support=minsupport) if metrics is not None else nullcontext():
+                export_file_name, department_export_dict, session = run_apriori_on_data(
+                    sequence_db, transactions, minsupport, department_folder, department_name, start_time, output_path,
+                    mining_options=mining_options, summary_lock=summary_lock, mined_results=mined_results, level_stats=level_stats
+                )
+            outcomes.append((minsupport, export_file_name, department_export_dict, session, mined_support, level_stats, source))
+
+    return outcomes
+
+def format_log_entry(minsupport, session, export_file_name, lowest_support, level_stats, source=None, department=None):
+    """Format the run_log.txt line of one min support."""
+    entry = f"Min Support: {minsupport}, Runtime: {session:.2f} seconds, CSV: {export_file_name}"
+    if lowest_support is not None and minsupport != lowest_support:
+        entry += f", Derived from Min Support: {lowest_support}"
+    if source:
+        entry += f", {source}"
+    if level_stats:
+        pruned = ', '.join(f"{stats['level']}: {stats['pruned']}/{stats['candidates']}" for stats in level_stats)
+        entry += f", Pruned Candidates per Level: {pruned}"
+    if department is not None:
+        entry = f"Department: {department}, " + entry
+    return entry
+
+def run_separate_mode(departments, min_supports, input_df, output_path, run_mode_var, mining_options=None, department_workers=1, shared_mining=True, result_cache=None, incremental=None, metrics=None,
+                      enrollment_filters=None):
     """
     Execute the Apriori algorithm for each department separately.
 
     Args:
         departments (list): List of department codes to process.
         min_supports (list): List of minimum support values.
-        input_df (DataFrame): The input DataFrame containing the data to be processed.
+        input_df (DataFrame, CsvSource or CachedInput): The input DataFrame containing the data to be processed, a CSV file to stream,
+            or an input cached between runs.
         output_path (str): The directory where the results will be stored.
         run_mode_var (str): The running mode, should be "separate" in this case.
+        mining_options (dict): Keyword options for `mine_sequences`, e.g. the engine.
+        department_workers (int): Number of processes running departments (and, without shared mining,
+            min supports) concurrently.
+        shared_mining (bool): Mine each department once at the lowest min support (see `run_thresholds_on_data`).
+        result_cache (ResultCache): Cache of mined results shared across runs.
+        incremental (IncrementalMiner): Keeps the results of each dataset up to date across runs.
+        metrics (RunMetrics): Receives the "encode" stage and the records of each dataset (see `run_thresholds_on_data`).
+        enrollment_filters (dict): Grade and credit predicates applied to the rows before encoding (see `filter_enrollments`).
 
     Returns:
         tuple: A tuple containing the results dictionary and log entries.
@@ -311,37 +611,58 @@ def run_separate_mode(departments, min_supports, input_df, output_path, run_mode
     export_dict = {}
     log_entries = []
 
-    all_data = dataframe_gen(input_df, departments, run_mode_var, output_path, is_course_data)
+    with metrics.stage("encode") if metrics is not None else nullcontext():
+        all_data = dataframe_gen(input_df, departments, run_mode_var, output_path, is_course_data, enrollment_filters)
 
+    # One task per department when thresholds share a mining run, otherwise one per department and min support
+    threshold_groups = [min_supports] if shared_mining else [[minsupport] for minsupport in min_supports]
+    tasks = []
     for department in departments:
         department_folder = path.join(output_path, department)
         makedirs(department_folder, exist_ok=True)
 
-        department_transactions, department_df, department_new_df = all_data[department]
+        department_transactions, department_db = all_data[department]
 
-        for minsupport in min_supports:
-            start_time = time.time()
+        for thresholds in threshold_groups:
+            tasks.append((department_db, department_transactions, thresholds, department_folder, department))
 
-            export_file_name, department_export_dict, session = run_apriori_on_data(
-                department_df, department_new_df, department_transactions, minsupport, department_folder, department, start_time, output_path
-            )
+    threshold_options = dict(mining_options=mining_options, shared_mining=shared_mining, result_cache=result_cache, incremental=incremental, metrics=metrics)
+    if department_workers > 1 and len(tasks) > 1:
+        # Departments share nothing but the input, so the tasks run in worker processes; Export.txt appends
+        # are serialized with a shared lock and the log keeps the task order.
+        with Manager() as manager, ProcessPoolExecutor(max_workers=department_workers) as executor:
+            summary_lock = manager.Lock()
+            futures = [executor.submit(run_thresholds_on_data, *task, output_path, summary_lock=summary_lock, **threshold_options) for task in tasks]
+            task_outcomes = [future.result() for future in futures]
+    else:
+        task_outcomes = [run_thresholds_on_data(*task, output_path, **threshold_options) for task in tasks]
 
+    for (_, _, _, _, department), outcomes in zip(tasks, task_outcomes):
+        for minsupport, export_file_name, department_export_dict, session, lowest_support, level_stats, source in outcomes:
             export_dict_key = f"{department}_{minsupport}"
             export_dict[export_dict_key] = department_export_dict
-            log_entries.append(f"Department: {department}, Min Support: {minsupport}, Runtime: {session:.2f} seconds, CSV: {export_file_name}")
+            log_entries.append(format_log_entry(minsupport, session, export_file_name, lowest_support, level_stats, source, department))
 
     return export_dict, log_entries
 
-def run_together_mode(departments, min_supports, input_df, output_path, run_mode_var):
+def run_together_mode(departments, min_supports, input_df, output_path, run_mode_var, mining_options=None, shared_mining=True, result_cache=None, incremental=None, metrics=None,
+                      enrollment_filters=None):
     """
     Execute the Apriori algorithm for all departments together.
 
     Args:
         departments (list): List of department codes to process.
         min_supports (list): List of minimum support values.
-        input_df (DataFrame): The input DataFrame containing the data to be processed.
+        input_df (DataFrame, CsvSource or CachedInput): The input DataFrame containing the data to be processed, a CSV file to stream,
+            or an input cached between runs.
         output_path (str): The directory where the results will be stored.
         run_mode_var (str): The running mode, should be "together" in this case.
+        mining_options (dict): Keyword options for `mine_sequences`, e.g. the engine.
+        shared_mining (bool): Mine once at the lowest min support (see `run_thresholds_on_data`).
+        result_cache (ResultCache): Cache of mined results shared across runs.
+        incremental (IncrementalMiner): Keeps the results of each dataset up to date across runs.
+        metrics (RunMetrics): Receives the "encode" stage and the records of each dataset (see `run_thresholds_on_data`).
+        enrollment_filters (dict): Grade and credit predicates applied to the rows before encoding (see `filter_enrollments`).
 
     Returns:
         tuple: A tuple containing the results dictionary and log entries.
@@ -355,50 +676,113 @@ def run_together_mode(departments, min_supports, input_df, output_path, run_mode
     department_folder = path.join(output_path, department_folder_name)
     makedirs(department_folder, exist_ok=True)
 
-    transactions, df, new_df = dataframe_gen(input_df, departments, run_mode_var, department_folder, is_course_data)
+    with metrics.stage("encode") if metrics is not None else nullcontext():
+        transactions, sequence_db = dataframe_gen(input_df, departments, run_mode_var, department_folder, is_course_data, enrollment_filters)
 
-    for minsupport in min_supports:
-        start_time = time.time()
-
-        export_file_name, department_export_dict, session = run_apriori_on_data(
-            df, new_df, transactions, minsupport, department_folder, department_folder_name, start_time, output_path
-        )
+    outcomes = run_thresholds_on_data(
+        sequence_db, transactions, min_supports, department_folder, department_folder_name, output_path,
+        mining_options=mining_options, shared_mining=shared_mining, result_cache=result_cache, incremental=incremental, metrics=metrics
+    )
 
+    for minsupport, export_file_name, department_export_dict, session, lowest_support, level_stats, source in outcomes:
         export_dict_key = f"{department_folder_name}_{minsupport}"
         export_dict[export_dict_key] = department_export_dict
-        log_entries.append(f"Min Support: {minsupport}, Runtime: {session:.2f} seconds, CSV: {export_file_name}")
+        log_entries.append(format_log_entry(minsupport, session, export_file_name, lowest_support, level_stats, source))
 
     return export_dict, log_entries
 
 
-def execute_tool(input_df, support_thresholds, departments, run_mode, output_dir):
+def execute_tool(input_df, support_thresholds, departments, run_mode, output_dir, engine="gsp", counting="hashtree", workers=1, department_workers=1, shared_mining=True, result_cache=None, incremental=None, metrics=None,
+                 max_length=None, candidate_batch=None, spill_dir=None, top_k=None, patterns="all", min_gap=None, max_gap=None, window=None, enrollment_filters=None):
     """
     Main function to execute the tool based on the selected mode. It orchestrates the execution of the algorithm,
     stores the results in the specified output directory, and logs the details of the execution.
 
     Args:
-        input_df (DataFrame): The input DataFrame containing the data to be processed.
+        input_df (DataFrame, CsvSource or CachedInput): The input DataFrame containing the data to be processed, a CSV file to stream,
+            or an input cached between runs.
         support_thresholds (list): List of minimum support values to be used in the Apriori algorithm.
         departments (list): List of department codes to be processed. If run_mode is "separate", each department is processed separately.
         run_mode (str): The running mode. Should be either "separate" or "together", depending on whether the departments are processed separately or together.
         output_dir (str): The directory where the results, including the log file, will be stored.
+        engine (str): Mining engine, "gsp" (default) for the level-wise Apriori loop, "spade" for vertical id-list joins,
+            or "prefixspan" for pattern growth without candidate generation.
+        counting (str): Counting backend of the "gsp" engine, "hashtree" (default) or "scan" for the original engine, e.g. to compare results.
+        workers (int): Number of processes counting shards of students in parallel with the "gsp" engine. Default: 1.
+        department_workers (int): Number of processes running departments and min-supports concurrently in "separate" mode. Default: 1.
+        shared_mining (bool): When several support thresholds are given, mine once at the lowest and derive the others from it. Default: True.
+        result_cache (ResultCache): Persistent cache of mined results; runs repeating the data and options of an earlier run, at the
+            same or a higher min support, are served from it instead of mining. Default: None (no caching).
+        incremental (IncrementalMiner): Keeps each dataset's results across runs and updates them with the students whose
+            sequences changed, e.g. after a term is appended. Default: None (mine from scratch).
+        metrics (RunMetrics): Receives the stage and per-level records of the run, e.g. with a callback reporting progress;
+            they are written to metrics.jsonl in the run folder, with any records made before the call. With department
+            workers, the callback must be picklable. Default: None (a new RunMetrics without callback).
+        max_length (int): Longest sequences mined, in items, bounding the deepest level of the search. Default: None (no limit).
+        candidate_batch (int): Largest number of candidates the "gsp" engine generates and counts at once, bounding the memory
+            of a level at the cost of a pass over the data per batch. Default: None (a whole level at once).
+        spill_dir (str): Write the mined levels to this directory as they complete and stream them to the CSVs, instead of
+            keeping every level in memory. The returned results read from it, so keep it until they are no longer needed.
+            Default: None (in memory).
+        top_k (int): Mine the `top_k` most frequent sequences of each dataset instead of those meeting a min support; the
+            support rises to the k-th highest count as sequences are found, and is reported in the log. The lowest of
+            `support_thresholds`, if any, is a floor. Only the "gsp" engine supports it, and not with `incremental`. Default: None.
+        patterns (str): Sequences exported: "all" frequent ones (default), "closed" ones, which have no super-sequence with the same
+            support, or "maximal" ones, which have no frequent super-sequence. Non-closed branches are pruned during the search, so
+            both take less time and give much smaller CSVs on long common paths. Only the "prefixspan" engine supports them, and
+            not with `incremental`; maximal sequences depend on the min support, so each threshold is mined on its own.
+        min_gap (float): Only count sequences whose consecutive terms are more than `min_gap` periods apart. Periods are the
+            distinct time groups of the data in order, e.g. consecutive semesters are 1 period apart. Default: None.
+        max_gap (float): Only count sequences whose consecutive terms are at most `max_gap` periods apart, e.g. 2 for courses
+            taken within 2 semesters of each other. Default: None.
+        window (float): Let the courses of one term of a sequence be taken up to `window` periods apart. Default: None.
+            The time constraints are enforced while counting, so occurrences breaking them are never enumerated. Only the
+            "gsp" engine supports them, and not with `incremental`.
+        enrollment_filters (dict): Keep only some enrollment rows, e.g. ``{"passing_only": True, "min_grade": 2, "min_credit_hours": 3}``,
+            and optionally tag items with their grade bucket (``{"grade_buckets": True}``). The predicates run with the department
+            filter while encoding, so filtered rows never reach the sequences or the sequence cache (see `filter_enrollments`).
+            Default: None (every row).
 
     Returns:
         dict: A dictionary containing the results of the Apriori algorithm execution for the given parameters.
     """
     results = {}
 
+    if top_k is not None:
+        if incremental is not None:
+            raise ValueError("Top-k mining cannot be combined with incremental updates")
+        support_thresholds = [min(support_thresholds)] if support_thresholds else [1]
+    if patterns != "all" and incremental is not None:
+        raise ValueError(f"Mining {patterns} patterns cannot be combined with incremental updates")
+    if patterns == "maximal":
+        shared_mining = False
+    if (min_gap or max_gap is not None or window) and incremental is not None:
+        raise ValueError("Time constraints cannot be combined with incremental updates")
+
     timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
     output_folder = f"GSP_Run_{timestamp}"
     output_path = path.join(output_dir, output_folder)
     makedirs(output_path, exist_ok=True)
 
     log_entries = []
-
-    if run_mode == "separate":
-        results, log_entries = run_separate_mode(departments, support_thresholds, input_df, output_path, run_mode)
-    elif run_mode == "together":
-        results, log_entries = run_together_mode(departments, support_thresholds, input_df, output_path, run_mode)
+    mining_options = {"engine": engine, "counting": counting, "workers": workers, "max_length": max_length, "candidate_batch": candidate_batch, "spill_dir": spill_dir, "top_k": top_k, "patterns": patterns,
+                      "min_gap": min_gap, "max_gap": max_gap, "window": window}
+
+    metrics = metrics if metrics is not None else RunMetrics()
+    metrics.open(path.join(output_path, "metrics.jsonl"))
+    metrics.record("run", departments=departments, min_supports=support_thresholds, run_mode=run_mode, enrollment_filters=enrollment_filters, **mining_options)
+
+    with metrics.stage("total"):
+        if run_mode == "separate":
+            results, log_entries = run_separate_mode(
+                departments, support_thresholds, input_df, output_path, run_mode, mining_options=mining_options, department_workers=department_workers,
+                shared_mining=shared_mining, result_cache=result_cache, incremental=incremental, metrics=metrics, enrollment_filters=enrollment_filters
+            )
+        elif run_mode == "together":
+            results, log_entries = run_together_mode(
+                departments, support_thresholds, input_df, output_path, run_mode, mining_options=mining_options,
+                shared_mining=shared_mining, result_cache=result_cache, incremental=incremental, metrics=metrics, enrollment_filters=enrollment_filters
+            )
 
     log_filepath = path.join(output_path, "run_log.txt")
     with open(log_filepath, 'w') as log_file:
@@ -0,0 +1,130 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from itertools import repeat
+from sequence_db import is_subsequence
+
+class _Node:
+    __slots__ = ('children', 'candidates')
+
+    def __init__(self):
+        self.children = None    # bucket -> _Node once the node has been split
+        self.candidates = []    # (candidate, flattened items) pairs while the node is a leaf
+
+class CandidateHashTree:
+    """
+    GSP candidate hash tree.
+
+    Candidates of one level are stored by hashing their d-th item (in term order) at depth d, so that
+    counting a sequence only descends into the buckets of items it actually holds, and only the
+    candidates in the leaves it reaches are checked for containment.
+
+    Args:
+        candidates (list): Candidates of one level, as tuples of terms of item codes.
+        leaf_size (int): Number of candidates a leaf holds before it is split.
+        fanout (int): Number of hash buckets per interior node.
+        time_constraints (TimeConstraints): If given, candidates are only counted where they occur within
+            the constraints, which needs the term times of the sequences.
+    """
+
+    def __init__(self, candidates, leaf_size=32, fanout=64, time_constraints=None):
+        self.leaf_size = leaf_size
+        self.fanout = fanout
+        self.time_constraints = time_constraints
+        self.root = _Node()
+        for candidate in candidates:
+            flat = tuple(item for term in candidate for item in term)
+            self._insert(self.root, candidate, flat, 0)
+
+    def _insert(self, node, candidate, flat, depth):
+        while node.children is not None:
+            node = node.children.setdefault(flat[depth] % self.fanout, _Node())
+            depth += 1
+
+        node.candidates.append((candidate, flat))
+        if len(node.candidates) > self.leaf_size and depth < len(flat):
+            entries = node.candidates
+            node.candidates = []
+            node.children = {}
+            for entry_candidate, entry_flat in entries:
+                self._insert(node, entry_candidate, entry_flat, depth)
+
+    def count(self, sequences, weights=None, times=None):
+        """
+        Count how many sequences contain each candidate.
+
+        Args:
+            sequences (iterable): Sequences as tuples of terms of item codes.
+            weights (iterable): Weight of each sequence, added instead of 1 (see `SequenceDatabase.deduplicate`).
+            times (iterable): Term times of each sequence, needed with time constraints (see `SequenceDatabase.term_times`).
+
+        Returns:
+            dict: Dictionary containing the count of occurrences for each candidate.
+        """
+        counts = defaultdict(int)
+        if weights is None and times is None:
+            for sequence in sequences:
+                self.count_sequence(sequence, counts)
+        else:
+            weights = repeat(1) if weights is None else weights
+            times = repeat(None) if times is None else times
+            for sequence, weight, sequence_times in zip(sequences, weights, times):
+                self.count_sequence(sequence, counts, weight, sequence_times)
+        return counts
+
+    def count_sequence(self, sequence, counts, weight=1, times=None):
+        """Add ``weight`` to the count of every candidate contained in ``sequence`` (with term ``times``, under the time constraints)."""
+        flat = [item for term in sequence for item in term]
+        fanout = self.fanout
+        constraints = self.time_constraints
+        if constraints is not None and (constraints.window or constraints.max_gap is not None):
+            # The items of a candidate term may come from any term of the window, in any order, so below a node
+            # reached through position i the positions from the first term within the window before it are hashed.
+            # The next item of a candidate is at most max(window, max gap) periods after an item, so the positions
+            # past that are not.
+            flat_times = [time for term, time in zip(sequence, times) for _ in term]
+            next_ranges = [
+                (
+                    bisect_left(flat_times, time - constraints.window) if constraints.window else position + 1,
+                    len(flat) if constraints.max_gap is None else bisect_right(flat_times, time + max(constraints.window, constraints.max_gap)),
+                )
+                for position, time in enumerate(flat_times)
+            ]
+        else:
+            next_ranges = None
+
+        # A candidate's items appear in the flattened sequence in the same order as in the candidate,
+        # so below a node reached through position i only positions after i need to be hashed. Each
+        # bucket is entered from its earliest position, which leaves the most room for the remaining
+        # items, so every node is visited at most once per sequence.
+        def visit(node, start, stop):
+            if node.children is None:
+                for candidate, _ in node.candidates:
+                    if constraints is None:
+                        contained = is_subsequence(candidate, sequence)
+                    else:
+                        contained = constraints.contains(candidate, sequence, times)
+                    if contained:
+                        counts[candidate] += weight
+                return
+            if next_ranges is None:
+                seen = set()
+                for position in range(start, stop):
+                    bucket = flat[position] % fanout
+                    if bucket not in seen:
+                        seen.add(bucket)
+                        child = node.children.get(bucket)
+                        if child is not None:
+                            visit(child, position + 1, len(flat))
+                return
+            # The positions hashed below a bucket run from the start of its first position's range to the end
+            # of its last position's, covering the range of each of its positions
+            first, last = {}, {}
+            for position in range(start, stop):
+                bucket = flat[position] % fanout
+                if bucket in node.children:
+                    first.setdefault(bucket, position)
+                    last[bucket] = position
+            for bucket, position in first.items():
+                visit(node.children[bucket], next_ranges[position][0], next_ranges[last[bucket]][1])
+
+        visit(self.root, 0, len(flat))
@@ -0,0 +1,125 @@
+import json
+import pickle
+from collections import Counter
+from math import ceil
+from os import path, makedirs, replace
+from tempfile import mkstemp
+from utils import generate_hash
+from hash_tree import CandidateHashTree
+from result_cache import _EXECUTION_OPTIONS
+
+class IncrementalMiner:
+    """
+    Keep the results of each dataset up to date as enrollments are appended, instead of re-mining the
+    whole history.
+
+    A full mining run is made at ``border_ratio`` times the requested min support, and its results are
+    stored with the sequence database they came from. The itemsets between that support and the
+    requested one are the border: they are tracked although not frequent yet. On the next run the new
+    database is compared with the stored one, and the counts are updated with the sequences that were
+    added or removed only (the students who took a new term). An itemset that is not tracked had a
+    count below the border support, and can have gained at most one per added sequence since; as long as
+    that bound stays below the requested min support the updated counts are exact, otherwise the
+    dataset is mined again from scratch.
+
+    Args:
+        state_dir (str): Directory holding the state of each dataset.
+        border_ratio (float): Support of the full runs relative to the requested min support, below 1 to
+            leave room for updates.
+    """
+
+    def __init__(self, state_dir, border_ratio=0.8):
+        self.state_dir = state_dir
+        self.border_ratio = border_ratio
+
+    def _state_path(self, name, mining_options):
+        options = {option: value for option, value in (mining_options or {}).items() if option not in _EXECUTION_OPTIONS}
+        return path.join(self.state_dir, generate_hash(f"{name}|{json.dumps(options, sort_keys=True, default=str)}") + '.pkl')
+
+    def mine(self, sequence_db, min_support, name, mining_options=None, level_stats=None, metrics=None):
+        """
+        Return the results of ``sequence_db`` at ``min_support``, updating the stored ones when possible.
+
+        Args:
+            sequence_db (SequenceDatabase): Current encoded sequence database of the dataset.
+            min_support (float): Minimum support threshold.
+            name (str): Name identifying the dataset across runs, e.g. the department.
+            mining_options (dict): Keyword options for `mine_sequences`.
+            level_stats (list): Receives the per-level candidate statistics of a full run.
+            metrics (RunMetrics): Receives the per-level records of a full run.
+
+        Returns:
+            tuple: The results dictionary, and the number of sequences added or removed since the stored
+            results, or None after a full run.
+        """
+        from gsp_algorithm import mine_sequences, filter_results
+
+        state_path = self._state_path(name, mining_options)
+        state = None
+        if path.exists(state_path):
+            with open(state_path, 'rb') as file:
+                state = pickle.load(file)
+
+        changed = None
+        if state is not None:
+            changed = _update(state, sequence_db)
+        if changed is None or state['untracked_bound'] >= min_support:
+            border_support = min_support * self.border_ratio
+            # The state outlives the run, so its results are kept in it rather than in a spill directory
+            options = {option: value for option, value in (mining_options or {}).items() if option != 'spill_dir'}
+            state = {
+                'sequence_db': sequence_db,
+                'results': mine_sequences(sequence_db, border_support, level_stats=level_stats, metrics=metrics, **options),
+                'untracked_bound': ceil(border_support) - 1,
+            }
+            changed = None
+
+        makedirs(self.state_dir, exist_ok=True)
+        handle, staging_path = mkstemp(dir=self.state_dir, suffix='.tmp')
+        with open(handle, 'wb') as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        replace(staging_path, state_path)
+
+        return filter_results(state['results'], min_support), changed
+
+def _update(state, sequence_db):
+    """
+    Bring a stored state up to ``sequence_db``, counting only the sequences that differ.
+
+    Returns:
+        int: Number of sequences added or removed, or None if the state cannot be updated (an item of
+        the stored data no longer exists).
+    """
+    old_db = state['sequence_db']
+    codes = {label: code for code, label in enumerate(sequence_db.labels)}
+    if any(label not in codes for label in old_db.labels):
+        return None
+    remap = [codes[label] for label in old_db.labels]
+
+    def translate(pattern):
+        return tuple(tuple(sorted(remap[item] for item in term)) for term in pattern)
+
+    # Multisets of sequences, a deduplicated sequence counting for its weight
+    old_sequences = Counter()
+    for sequence, weight in zip(old_db.sequences, old_db.sequence_weights().tolist()):
+        old_sequences[translate(sequence)] += weight
+    new_sequences = Counter()
+    for sequence, weight in zip(sequence_db.sequences, sequence_db.sequence_weights().tolist()):
+        new_sequences[sequence] += weight
+    added = new_sequences - old_sequences
+    removed = old_sequences - new_sequences
+
+    results = {}
+    for level, itemset_count in state['results'].items():
+        itemset_count = {translate(itemset): count for itemset, count in itemset_count.items()}
+        tree = CandidateHashTree(list(itemset_count))
+        for itemset, count in tree.count(added.keys(), added.values()).items():
+            itemset_count[itemset] += count
+        for itemset, count in tree.count(removed.keys(), removed.values()).items():
+            itemset_count[itemset] -= count
+        results[level] = itemset_count
+
+    state['sequence_db'] = sequence_db
+    state['results'] = results
+    state['untracked_bound'] += added.total()
+    return added.total() + removed.total()
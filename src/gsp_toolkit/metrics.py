@@ -0,0 +1,88 @@
+import json
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from os import getpid
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def peak_memory_mb(children=False):
+    """
+    Return the peak resident memory of the current process in MB, or None where it is not available.
+
+    With ``children``, return instead the peak of its largest child process that has exited and been waited
+    for, e.g. the workers of a closed process pool (0 without any).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (2**20 if sys.platform == 'darwin' else 2**10), 1)
+
+class RunMetrics:
+    """
+    Structured metrics of a run, written as JSON lines as the run goes.
+
+    Each record holds an event name ("stage" for a timed step of the pipeline, "level" for a level of the
+    GSP loop), its fields, the time, the process id, the peak memory of the process so far and that of its
+    largest child process that has exited (see `peak_memory_mb`), so runs with worker pools are not
+    measured on the parent alone. Records
+    made before a file is opened are kept and written when it is (e.g. the preprocessing done before
+    `execute_tool` creates the run folder).
+
+    Args:
+        file_path (str): JSON lines file the records are appended to.
+        callback (callable): Called with every record as it is made, e.g. to report progress.
+        context (dict): Fields added to every record, e.g. the department.
+    """
+
+    def __init__(self, file_path=None, callback=None, context=None):
+        self.file_path = file_path
+        self.callback = callback
+        self.context = context or {}
+        self.pending = []
+
+    def open(self, file_path):
+        """Start writing to ``file_path``, including the records made so far."""
+        self.file_path = file_path
+        pending, self.pending = self.pending, []
+        with open(file_path, 'a') as file:
+            for entry in pending:
+                file.write(json.dumps(entry, default=str) + '\n')
+
+    def bind(self, **context):
+        """Return metrics writing to the same file and callback, with extra fields on every record."""
+        bound = RunMetrics(self.file_path, self.callback, {**self.context, **context})
+        bound.pending = self.pending
+        return bound
+
+    def record(self, event, **fields):
+        """Write one record."""
+        entry = {
+            "event": event,
+            **self.context,
+            **fields,
+            "time": datetime.now().isoformat(timespec='milliseconds'),
+            "pid": getpid(),
+            "peak_memory_mb": fields.get("peak_memory_mb", peak_memory_mb()),
+            "children_peak_memory_mb": peak_memory_mb(children=True),
+        }
+        if self.file_path is None:
+            self.pending.append(entry)
+        else:
+            # One write per line, so records of concurrent worker processes do not interleave
+            with open(self.file_path, 'a') as file:
+                file.write(json.dumps(entry, default=str) + '\n')
+        if self.callback is not None:
+            self.callback(entry)
+
+    @contextmanager
+    def stage(self, name, **fields):
+        """Time the enclosed block and record it as a stage."""
+        start = time.perf_counter()
+        yield
+        self.record("stage", stage=name, seconds=round(time.perf_counter() - start, 6), **fields)
@@ -0,0 +1,151 @@
+import pickle
+import numpy as np
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from sequence_db import SequenceDatabase
+from metrics import peak_memory_mb
+
+_ARRAYS = ('items', 'term_offsets', 'sequence_offsets', 'weights', 'times')
+
+# Per-worker state, set up once by `_attach_worker`
+_worker_state = {}
+
+def _open_shared_memory(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        return shared_memory.SharedMemory(name=name)
+
+def _attach_worker(layout, labels):
+    """Map the shared CSR arrays into the worker without copying them."""
+    blocks = {}
+    arrays = {}
+    for array_name, (block_name, dtype, length) in layout.items():
+        blocks[array_name] = _open_shared_memory(block_name)
+        arrays[array_name] = np.ndarray((length,), dtype=dtype, buffer=blocks[array_name].buf)
+    _worker_state['blocks'] = blocks
+    _worker_state['database'] = SequenceDatabase(arrays['items'], arrays['term_offsets'], arrays['sequence_offsets'], labels, arrays.get('weights'), arrays.get('times'))
+    _worker_state['shards'] = {}
+    _worker_state['candidates'] = (None, None)
+
+def _shared_candidates(block_name, size):
+    """Return the candidates pickled into shared memory block ``block_name``, unpickling them once per worker."""
+    cached_name, candidate_itemsets = _worker_state['candidates']
+    if cached_name != block_name:
+        block = _open_shared_memory(block_name)
+        try:
+            candidate_itemsets = pickle.loads(block.buf[:size])
+        finally:
+            block.close()
+        _worker_state['candidates'] = (block_name, candidate_itemsets)
+    return candidate_itemsets
+
+def _count_shard(candidates, start, stop, counting, reduction, time_constraints):
+    """
+    Count the candidates over one shard of students, keeping the shard's decoded sequences between levels.
+
+    ``candidates`` is the ``(block name, size)`` of the candidates pickled into shared memory by
+    `ShardedCounter.count`.
+
+    The shard is reduced with the latest ``(version, keep items, min length)`` reduction of the database
+    if it has not been yet. Reductions only ever strip more, so the latest one brings a shard of any
+    earlier version up to date.
+
+    Returns:
+        tuple: The counts of the shard, and the peak memory of the worker so far in MB.
+    """
+    from gsp_algorithm import count_candidates
+
+    shards = _worker_state['shards']
+    if (start, stop) not in shards:
+        shards[(start, stop)] = (0, _worker_state['database'].shard(start, stop))
+    version, shard = shards[(start, stop)]
+    if reduction is not None and reduction[0] != version:
+        shard = shard.reduce(*reduction[1:])
+        shards[(start, stop)] = (reduction[0], shard)
+    return dict(count_candidates(_shared_candidates(*candidates), shard, counting, time_constraints)), peak_memory_mb()
+
+class ShardedCounter:
+    """
+    Count candidates in parallel over shards of students.
+
+    The CSR arrays of the sequence database are copied once into shared memory and mapped by every worker
+    of a process pool. The candidates of each level are pickled once into shared memory too, so the
+    tasks only carry shard bounds and each worker unpickles the candidates once per level. Use it
+    as a context manager so the pool and the shared memory are released.
+
+    Args:
+        sequence_db (SequenceDatabase): Encoded sequence database.
+        workers (int): Number of worker processes.
+        counting (str): Counting backend used inside each worker (see `count_candidates`).
+        time_constraints (TimeConstraints): Time constraints the candidates are counted under, if any.
+    """
+
+    def __init__(self, sequence_db, workers, counting="hashtree", time_constraints=None):
+        self.counting = counting
+        self.time_constraints = time_constraints
+        self.blocks = []
+        layout = {}
+        for array_name in _ARRAYS:
+            array = getattr(sequence_db, array_name)
+            if array is None:
+                continue
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+            self.blocks.append(block)
+            layout[array_name] = (block.name, array.dtype.str, len(array))
+
+        # Several shards per worker so uneven shards do not leave workers idle
+        boundaries = np.linspace(0, len(sequence_db), min(len(sequence_db), workers * 4) + 1).astype(int)
+        self.shards = [(start, stop) for start, stop in zip(boundaries[:-1].tolist(), boundaries[1:].tolist()) if stop > start]
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_attach_worker, initargs=(layout, sequence_db.labels))
+        self.reduction = None
+        # Highest peak memory reported by a worker, in MB
+        self.peak_memory_mb = None
+
+    def reduce(self, keep_items, min_length):
+        """Reduce the database the next levels are counted over, as `SequenceDatabase.reduce` does, in every worker."""
+        version = self.reduction[0] + 1 if self.reduction else 1
+        self.reduction = (version, sorted(keep_items), min_length)
+
+    def count(self, candidate_itemsets):
+        """
+        Count the candidates of one level, merging the per-shard counts.
+
+        Args:
+            candidate_itemsets (list): List of candidate itemsets.
+
+        Returns:
+            dict: Dictionary containing the count of occurrences for each candidate.
+        """
+        payload = pickle.dumps(candidate_itemsets, protocol=pickle.HIGHEST_PROTOCOL)
+        block = shared_memory.SharedMemory(create=True, size=max(len(payload), 1))
+        try:
+            block.buf[:len(payload)] = payload
+            candidates = (block.name, len(payload))
+            futures = [self.executor.submit(_count_shard, candidates, start, stop, self.counting, self.reduction, self.time_constraints) for start, stop in self.shards]
+            counts = defaultdict(int)
+            for future in futures:
+                shard_counts, worker_peak = future.result()
+                for itemset, count in shard_counts.items():
+                    counts[itemset] += count
+                if worker_peak is not None:
+                    self.peak_memory_mb = max(self.peak_memory_mb or 0, worker_peak)
+            return counts
+        finally:
+            block.close()
+            block.unlink()
+
+    def close(self):
+        self.executor.shutdown()
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,183 @@
+from bisect import bisect_right
+from collections import defaultdict
+from sequence_db import is_subsequence
+
+def project_items(sequences):
+    """
+    Build the projected database of every single item.
+
+    Args:
+        sequences (list): Sequences as tuples of terms of item codes.
+
+    Returns:
+        dict: Maps each item code to its projected database, a list of (sequence id, term indices) pairs
+        listing the terms of each sequence in which the item occurs.
+    """
+    projections = defaultdict(list)
+    for sid, sequence in enumerate(sequences):
+        positions = defaultdict(list)
+        for j, term in enumerate(sequence):
+            for item in term:
+                positions[item].append(j)
+        for item, ends in positions.items():
+            projections[item].append((sid, ends))
+    return projections
+
+def count_extensions(pattern, projection, sequences, weights=None):
+    """
+    Count the items that can extend a prefix, in one pass over its projected database.
+
+    Each projected entry is a (sequence id, term indices) pair: the terms in which the prefix's last term
+    can be matched, after the earliest match of the rest of the prefix. An item extends the last term
+    (itemset extension) if it follows the prefix's last item in one of these terms, and starts a new term
+    (sequence extension) if it occurs in any term after the first of them.
+
+    Each sequence counts once, or for its weight if ``weights`` is given.
+
+    Returns:
+        tuple: Two dicts mapping items to their support as itemset and as sequence extensions.
+    """
+    last_item = pattern[-1][-1]
+    i_counts = defaultdict(int)
+    s_counts = defaultdict(int)
+
+    for sid, ends in projection:
+        sequence = sequences[sid]
+        i_items = set()
+        for j in ends:
+            term = sequence[j]
+            i_items.update(term[bisect_right(term, last_item):])
+        s_items = set()
+        for j in range(ends[0] + 1, len(sequence)):
+            s_items.update(sequence[j])
+        weight = 1 if weights is None else weights[sid]
+        for item in i_items:
+            i_counts[item] += weight
+        for item in s_items:
+            s_counts[item] += weight
+
+    return i_counts, s_counts
+
+def prefixspan_algorithm(sequence_db, min_support, max_length=None, patterns="all"):
+    """
+    Mine frequent sequences by pattern growth (PrefixSpan-style): each frequent prefix is extended only by
+    the items that are frequent in its projected database, so no candidates are generated and memory is
+    bounded by the projected databases along the current growth path.
+
+    Closed patterns (no super-pattern with the same support) and maximal patterns (no frequent
+    super-pattern) are pruned during the growth. A prefix with an extension of the same support (closed)
+    or with any frequent extension (maximal) is not kept, and a prefix whose projected database is the
+    one of a super-pattern already grown with the same last term is not grown at all: each of its
+    extensions is contained in the same extension of the super-pattern, with the same support
+    (CloSpan's early termination). The patterns left are then checked against each other for the
+    super-patterns formed by inserting items before the last term.
+
+    Args:
+        sequence_db (SequenceDatabase): Encoded sequence database.
+        min_support (float): Minimum support threshold.
+        max_length (int): Longest sequences mined, in items; patterns of that length are not extended.
+            Closed and maximal patterns are then those of the capped search, without early termination.
+        patterns (str): "all" frequent patterns, "closed" or "maximal" ones.
+
+    Returns:
+        dict: A dictionary containing frequent itemsets of two or more items and their counts, by level.
+    """
+    if patterns not in ("all", "closed", "maximal"):
+        raise ValueError(f"Unsupported pattern type: {patterns}")
+
+    sequences = sequence_db.sequences
+    weights = None if sequence_db.weights is None else sequence_db.weights.tolist()
+    results_dict = defaultdict(dict)
+
+    def support(projection):
+        return len(projection) if weights is None else sum(weights[sid] for sid, _ in projection)
+
+    # Prefixes grown so far, by last term and projected database, for the early termination
+    grown = defaultdict(list)
+
+    def grow(pattern, projection, length):
+        if patterns != "all" and max_length is None:
+            # Keyed on the projected database itself, not a hash of it, so distinct projections never share a key
+            key = (pattern[-1], tuple((sid, tuple(ends)) for sid, ends in projection))
+            if any(is_subsequence(pattern, other) for other in grown[key]):
+                return
+            grown[key].append(pattern)
+
+        if max_length is not None and length >= max_length:
+            if patterns != "all" and length >= 2:
+                results_dict[f"Freq {length}-Itemsets"][pattern] = support(projection)
+            return
+        i_counts, s_counts = count_extensions(pattern, projection, sequences, weights)
+        column_name = f"Freq {length + 1}-Itemsets"
+
+        if patterns != "all" and length >= 2:
+            counts = [*i_counts.values(), *s_counts.values()]
+            pattern_support = support(projection)
+            bound = pattern_support if patterns == "closed" else min_support
+            if all(count < bound for count in counts):
+                results_dict[f"Freq {length}-Itemsets"][pattern] = pattern_support
+
+        for item in sorted(i_counts):
+            if i_counts[item] >= min_support:
+                child = pattern[:-1] + (pattern[-1] + (item,),)
+                child_projection = []
+                for sid, ends in projection:
+                    sequence = sequences[sid]
+                    child_ends = [j for j in ends if item in sequence[j]]
+                    if child_ends:
+                        child_projection.append((sid, child_ends))
+                if patterns == "all":
+                    results_dict[column_name][child] = i_counts[item]
+                grow(child, child_projection, length + 1)
+
+        for item in sorted(s_counts):
+            if s_counts[item] >= min_support:
+                child = pattern + ((item,),)
+                child_projection = []
+                for sid, ends in projection:
+                    sequence = sequences[sid]
+                    child_ends = [j for j in range(ends[0] + 1, len(sequence)) if item in sequence[j]]
+                    if child_ends:
+                        child_projection.append((sid, child_ends))
+                if patterns == "all":
+                    results_dict[column_name][child] = s_counts[item]
+                grow(child, child_projection, length + 1)
+
+    for item, projection in sorted(project_items(sequences).items()):
+        if support(projection) >= min_support:
+            grow(((item,),), projection, 1)
+
+    if patterns != "all":
+        return drop_subsumed(results_dict, same_support=patterns == "closed")
+    return dict(results_dict)
+
+def drop_subsumed(results_dict, same_support):
+    """
+    Drop the patterns contained in a longer pattern of the results, with the same support if `same_support`.
+
+    Args:
+        results_dict (dict): Candidate closed or maximal patterns and their counts, by level.
+        same_support (bool): Only a super-pattern with the same support subsumes a pattern (closed patterns).
+
+    Returns:
+        dict: The patterns of `results_dict` not subsumed, by level.
+    """
+    longer = sorted(
+        ((sum(len(term) for term in pattern), pattern, count) for itemset_count in results_dict.values() for pattern, count in itemset_count.items()),
+        key=lambda entry: entry[0], reverse=True,
+    )
+
+    kept = defaultdict(dict)
+    # Each candidate is checked against the longer ones sharing its support (or all the longer ones) that
+    # contain its rarest item, indexed by item
+    by_item = defaultdict(list)
+    for length, pattern, count in longer:
+        group = count if same_support else None
+        items = {item for term in pattern for item in term}
+        others = min((by_item[group, item] for item in items), key=len)
+        if not any(other_length > length and is_subsequence(pattern, other) for other_length, other in others):
+            kept[f"Freq {length}-Itemsets"][pattern] = count
+        for item in items:
+            by_item[group, item].append((length, pattern))
+
+    return {level: kept[level] for level in sorted(kept, key=lambda level: int(level.split()[1].split('-')[0]))}
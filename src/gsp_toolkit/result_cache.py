@@ -0,0 +1,121 @@
+import json
+import pickle
+from hashlib import md5
+from os import path, makedirs, listdir, replace, remove, stat, utime
+from tempfile import mkstemp
+from spill import SpilledResults
+
+# Mining options that change how the results are computed but not the results themselves
+_EXECUTION_OPTIONS = ('counting', 'workers', 'candidate_batch', 'spill_dir')
+
+def fingerprint_database(sequence_db):
+    """Return a hash of the contents of a sequence database, its arrays and item dictionary."""
+    fingerprint = md5()
+    for array in (sequence_db.items, sequence_db.term_offsets, sequence_db.sequence_offsets, sequence_db.sequence_weights()):
+        fingerprint.update(array.tobytes())
+    if sequence_db.times is not None:
+        fingerprint.update(sequence_db.times.tobytes())
+    fingerprint.update(json.dumps(sequence_db.labels).encode())
+    return fingerprint.hexdigest()
+
+class ResultCache:
+    """
+    Persistent cache of mined results, shared by every run pointed at the same directory.
+
+    Results are keyed by a fingerprint of the sequence database (so by dataset, department and run mode)
+    and by the mining options that affect them, and stored per min support. A request is served by the
+    entry mined at the highest min support not above it, sliced with `filter_results`; entries made
+    redundant by a lower one are dropped. Maximal patterns depend on the min support they were mined
+    at, so they are only served at that support. When the directory grows past `max_bytes`, the least recently
+    used entries are evicted.
+
+    Args:
+        cache_dir (str): Directory holding the cache entries.
+        max_bytes (int): Size the cache is trimmed to after each store. Default: 256 MiB.
+    """
+
+    def __init__(self, cache_dir, max_bytes=256 * 2**20):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _key(self, sequence_db, mining_options):
+        options = {name: value for name, value in (mining_options or {}).items() if name not in _EXECUTION_OPTIONS}
+        return md5(f"{fingerprint_database(sequence_db)}|{json.dumps(options, sort_keys=True, default=str)}".encode()).hexdigest()
+
+    def _entries(self, key):
+        """Return the (min support, file path) pairs stored under ``key``."""
+        if not path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for file_name in listdir(self.cache_dir):
+            entry_key, _, support = file_name[:-len('.pkl')].partition('_')
+            if entry_key == key and file_name.endswith('.pkl'):
+                entries.append((float(support), path.join(self.cache_dir, file_name)))
+        return entries
+
+    def get(self, sequence_db, min_support, mining_options=None):
+        """
+        Look up results covering ``min_support``.
+
+        Returns:
+            tuple: The cached results and the min support they were mined at (at most ``min_support``),
+            or None on a cache miss.
+        """
+        key = self._key(sequence_db, mining_options)
+        exact = (mining_options or {}).get("patterns") == "maximal"
+        for support, file_path in sorted(self._entries(key), reverse=True):
+            if support == min_support or (support < min_support and not exact):
+                try:
+                    with open(file_path, 'rb') as file:
+                        results = pickle.load(file)
+                    utime(file_path)  # mark as recently used
+                except (OSError, EOFError, pickle.UnpicklingError):
+                    continue
+                return results, support
+        return None
+
+    def put(self, sequence_db, min_support, mining_options, results):
+        """
+        Store the results mined at ``min_support``, then trim the cache to its size limit. Results spilled to
+        disk are not stored, as they only last as long as their spill directory.
+        """
+        if isinstance(results, SpilledResults):
+            return
+        makedirs(self.cache_dir, exist_ok=True)
+        key = self._key(sequence_db, mining_options)
+
+        # Written aside and renamed into place, so concurrent runs never read a partial entry
+        handle, staging_path = mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with open(handle, 'wb') as file:
+            pickle.dump(results, file, protocol=pickle.HIGHEST_PROTOCOL)
+        replace(staging_path, path.join(self.cache_dir, f"{key}_{float(min_support)}.pkl"))
+
+        if (mining_options or {}).get("patterns") != "maximal":
+            for support, file_path in self._entries(key):
+                if support > min_support:
+                    _remove(file_path)
+        self._evict()
+
+    def _evict(self):
+        """Remove the least recently used entries until the cache fits in `max_bytes`."""
+        entries = []
+        for file_name in listdir(self.cache_dir):
+            if file_name.endswith('.pkl'):
+                try:
+                    info = stat(path.join(self.cache_dir, file_name))
+                except OSError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, path.join(self.cache_dir, file_name)))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, file_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            _remove(file_path)
+            total -= size
+
+def _remove(file_path):
+    try:
+        remove(file_path)
+    except OSError:  # already removed by a concurrent run
+        pass
@@ -0,0 +1,86 @@
+import json
+from os import path, makedirs, replace
+from shutil import copyfile, rmtree
+from tempfile import mkdtemp
+from sequence_db import SequenceDatabase
+from utils import generate_hash, generate_file_hash
+
+# Part of every key, bumped when the stored databases change: entries of version 1 have no term times
+_FORMAT_VERSION = 2
+
+class CachedInput:
+    """
+    Input file whose encoded sequence databases are cached on disk between runs.
+
+    The databases built by `dataframe_gen` are stored under ``cache_dir`` as memory-mappable .npy arrays
+    plus their item dictionaries, keyed by a hash of the file contents, the preprocessing options, the
+    enrollment filters and the departments and run mode. A later run on the same file maps the cached arrays and starts mining
+    right away, without reading or preprocessing the file; `load` is only called on a cache miss. Pass
+    it to `execute_tool` in place of a DataFrame.
+
+    Answers given to the interactive time prompts change the sequences too: ask them before the lookup and
+    pass them in ``options``, as `load` is not called on a cache hit.
+
+    Args:
+        file_path (str): Path of the input file.
+        load (callable): Returns the preprocessed input (a DataFrame or a `CsvSource`) on a cache miss.
+        cache_dir (str): Directory holding the cache entries.
+        options (dict): Preprocessing options that change the encoded sequences, e.g. the time group unit.
+    """
+
+    def __init__(self, file_path, load, cache_dir, options=None):
+        self.file_path = file_path
+        self.load = load
+        self.cache_dir = cache_dir
+        self.options = options or {}
+        self._file_hash = None
+
+    def key(self, departments, run_mode, is_course_data, enrollment_filters=None):
+        """Return the cache key of the databases built for ``departments`` in ``run_mode`` with ``enrollment_filters``."""
+        if self._file_hash is None:
+            self._file_hash = generate_file_hash(self.file_path)
+        separate = is_course_data and run_mode == "separate"
+        options = json.dumps(self.options, sort_keys=True, default=str)
+        filters = json.dumps(enrollment_filters or {}, sort_keys=True, default=str)
+        return generate_hash(f"{_FORMAT_VERSION}|{self._file_hash}|{options}|{filters}|{','.join(sorted(departments))}|{separate}|{is_course_data}")
+
+    def load_databases(self, key, departments, department_folder):
+        """
+        Load a cache entry in the shape `dataframe_gen` returns, restoring its transactions_delimiter.csv.
+
+        Returns:
+            dict or tuple: The cached data, or None on a cache miss.
+        """
+        entry_path = path.join(self.cache_dir, key)
+        if not path.exists(path.join(entry_path, 'manifest.json')):
+            return None
+        with open(path.join(entry_path, 'manifest.json')) as file:
+            manifest = json.load(file)
+
+        copyfile(path.join(entry_path, 'transactions_delimiter.csv'), path.join(department_folder, 'transactions_delimiter.csv'))
+        if manifest['separate']:
+            return {department: _load_entry(path.join(entry_path, department)) for department in departments}
+        return _load_entry(path.join(entry_path, 'all'))
+
+    def save_databases(self, key, data, department_folder):
+        """Store the data returned by `dataframe_gen` under ``key``."""
+        makedirs(self.cache_dir, exist_ok=True)
+        # Entries are written aside and renamed into place, so concurrent runs never read a partial entry
+        staging_path = mkdtemp(dir=self.cache_dir)
+        separate = isinstance(data, dict)
+        groups = data.items() if separate else [('all', data)]
+        for group, (_, sequence_db) in groups:
+            makedirs(path.join(staging_path, group))
+            sequence_db.save(path.join(staging_path, group))
+        copyfile(path.join(department_folder, 'transactions_delimiter.csv'), path.join(staging_path, 'transactions_delimiter.csv'))
+        with open(path.join(staging_path, 'manifest.json'), 'w') as file:
+            json.dump({'separate': separate, 'file': path.abspath(self.file_path), 'options': self.options}, file, default=str)
+
+        try:
+            replace(staging_path, path.join(self.cache_dir, key))
+        except OSError:  # another run stored the same entry first
+            rmtree(staging_path, ignore_errors=True)
+
+def _load_entry(entry_path):
+    sequence_db = SequenceDatabase.load(entry_path)
+    return sequence_db.total_weight() + 1, sequence_db
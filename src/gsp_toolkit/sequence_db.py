@@ -0,0 +1,459 @@
+import json
+import numpy as np
+import pandas as pd
+from os import path
+
+def is_subsequence(candidate, sequence):
+    """
+    Check whether a candidate is contained in a sequence, matching each candidate block against the
+    earliest later block of the sequence that holds all of its items.
+
+    Args:
+        candidate (tuple): Candidate itemset as a tuple of blocks of item codes.
+        sequence (tuple): Sequence as a tuple of blocks of item codes.
+
+    Returns:
+        bool: True if the candidate is contained in the sequence.
+    """
+    z = 0
+    for block1 in candidate:
+        for j in range(z, len(sequence)):
+            block2 = sequence[j]
+            if len(block2) >= len(block1) and all(item in block2 for item in block1):
+                z = j + 1
+                break
+        else:
+            return False
+    return True
+
+class TimeConstraints:
+    """
+    GSP time constraints on how a pattern may occur in a sequence, in periods (see `SequenceDatabase.rank_times`).
+
+    A pattern occurs when each of its terms is matched by a run of consecutive terms of the sequence, such that:
+
+    - the items of a pattern term are all within the run, and the run spans at most ``window`` periods;
+    - a run starts more than ``min_gap`` periods after the previous run ends;
+    - a run ends at most ``max_gap`` periods after the previous run starts.
+
+    With no window, gap or max gap, this is the plain containment of `is_subsequence`. A max gap breaks the
+    anti-monotonicity of the supports for the subsequences that drop a middle term, so candidates are then
+    only pruned with their contiguous subsequences (see `prune_infrequent_subsequences`).
+
+    Args:
+        min_gap (float): Smallest number of periods strictly exceeded between consecutive pattern terms. Default: 0.
+        max_gap (float): Largest number of periods between the start of a pattern term and the end of the next. Default: no limit.
+        window (float): Largest number of periods the items of one pattern term may be spread over. Default: 0 (a single term).
+    """
+
+    def __init__(self, min_gap=None, max_gap=None, window=None):
+        self.min_gap = min_gap or 0
+        self.max_gap = max_gap
+        self.window = window or 0
+
+    def contains(self, candidate, sequence, times):
+        """
+        Check whether a candidate occurs in a sequence within the constraints.
+
+        Args:
+            candidate (tuple): Candidate itemset as a tuple of blocks of item codes.
+            sequence (tuple): Sequence as a tuple of blocks of item codes.
+            times (tuple): Period of each block of the sequence.
+
+        Returns:
+            bool: True if the candidate occurs in the sequence.
+        """
+        min_gap, max_gap, window = self.min_gap, self.max_gap, self.window
+        if not window:
+            return self._contains_in_terms(candidate, sequence, times)
+        last = len(candidate) - 1
+        failed = set()
+
+        # Match pattern term i from sequence term `start` on, the previous pattern term starting at `previous_start`.
+        # Each start is tried with its shortest run, which leaves the most room for the next terms; the searches that
+        # fail are remembered, as different runs of the previous terms often lead to the same one.
+        def match(i, start, previous_start):
+            if (i, start, previous_start) in failed:
+                return False
+            block1 = candidate[i]
+            for j in range(start, len(sequence)):
+                if i and max_gap is not None and times[j] - previous_start > max_gap:
+                    break
+                block2 = sequence[j]
+                if not window or len(block1) == 1:
+                    # The run is a single term
+                    if not all(item in block2 for item in block1):
+                        continue
+                    missing = None
+                else:
+                    missing = [item for item in block1 if item not in block2]
+                end = j
+                while missing and end + 1 < len(sequence) and times[end + 1] - times[j] <= window:
+                    end += 1
+                    missing = [item for item in missing if item not in sequence[end]]
+                if missing or (i and max_gap is not None and times[end] - previous_start > max_gap):
+                    continue
+                if i == last:
+                    return True
+                following = end + 1
+                while following < len(sequence) and times[following] - times[end] <= min_gap:
+                    following += 1
+                if match(i + 1, following, times[j]):
+                    return True
+            failed.add((i, start, previous_start))
+            return False
+
+        return match(0, 0, None)
+
+    def _contains_in_terms(self, candidate, sequence, times):
+        """`contains` without a window, each pattern term matched by a single term, with GSP's forward and backward phases."""
+        min_gap, max_gap = self.min_gap, self.max_gap
+        positions = [0] * len(candidate)
+        i = start = 0
+        while i < len(candidate):
+            # Forward: the earliest term from `start` on holding pattern term i
+            block1 = candidate[i]
+            for j in range(start, len(sequence)):
+                block2 = sequence[j]
+                if len(block2) >= len(block1) and all(item in block2 for item in block1):
+                    break
+            else:
+                return False
+            if i and max_gap is not None and times[j] - times[positions[i - 1]] > max_gap:
+                # Backward: pattern term i - 1 has to move to a term at most max gap before this one, which keeps
+                # the min gap to the term before it
+                i -= 1
+                start = positions[i] + 1
+                while times[start] < times[j] - max_gap:
+                    start += 1
+                continue
+            positions[i] = j
+            i += 1
+            start = j + 1
+            while start < len(sequence) and times[start] - times[j] <= min_gap:
+                start += 1
+        return True
+
+def _ranges(starts, counts, offsets):
+    """Concatenate ``range(start, start + count)`` for each start and count; ``offsets`` is the prefix sum of ``counts``."""
+    return np.repeat(starts - offsets[:-1], counts) + np.arange(offsets[-1])
+
+class SequenceDatabase:
+    """
+    Integer-encoded sequence database shared by every stage of a mining run.
+
+    Items are dictionary-encoded to ints, with codes following the sorted order of the item labels, so
+    sorting codes sorts labels. The database is stored CSR-style:
+
+    - ``items`` holds the item codes of every term back to back.
+    - ``term_offsets`` delimits the terms: term ``t`` is ``items[term_offsets[t]:term_offsets[t + 1]]``.
+    - ``sequence_offsets`` delimits the sequences (one per student): sequence ``s`` is made of the terms
+      ``sequence_offsets[s]`` to ``sequence_offsets[s + 1] - 1``.
+
+    - ``weights``, if not None, holds the number of students following each sequence, once identical
+      sequences are collapsed with `deduplicate`; supports are sums of weights.
+    - ``times``, if not None, holds the time of every term: its time group when encoded, its period once
+      ranked with `rank_times`. Only the time constraints of a mining run (see `TimeConstraints`) use them.
+
+    Patterns handled by the mining core are tuples of terms, each term a sorted tuple of item codes,
+    e.g. ``((0, 3), (5,))``. The pipe/comma string form (``"MATH1001,MATH1002|PHYS1501"``) is only
+    produced when exporting.
+    """
+
+    def __init__(self, items, term_offsets, sequence_offsets, labels, weights=None, times=None):
+        self.items = np.asarray(items, dtype=np.int32)
+        self.term_offsets = np.asarray(term_offsets, dtype=np.int64)
+        self.sequence_offsets = np.asarray(sequence_offsets, dtype=np.int64)
+        self.labels = list(labels)
+        self.weights = None if weights is None else np.asarray(weights, dtype=np.int64)
+        self.times = None if times is None else np.asarray(times, dtype=np.float64)
+        self._sequences = None
+        self._term_times = None
+
+    @classmethod
+    def from_frame(cls, df, item_column='Item', time_column='TimeGroup', id_column='ID'):
+        """
+        Build the database from enrollment rows with sorted-array operations, without grouping rows into
+        per-student lists.
+
+        Args:
+            df (DataFrame): One row per item taken, with item, time group and student id columns.
+            item_column (str): Column holding the items.
+            time_column (str): Column holding the time group; rows of a student sharing a value form one term.
+            id_column (str): Column identifying the student.
+
+        Returns:
+            SequenceDatabase: The encoded database, one sequence per student in sorted id order. Terms are
+            ordered by time, with their time group, and duplicate items within a term are collapsed. Rows
+            without a time group (e.g. unparseable dates) are dropped with a warning, as they belong to no term.
+        """
+        untimed = df[time_column].isna()
+        if untimed.any():
+            print(f"Warning: {int(untimed.sum())} rows without a time group were dropped.")
+            df = df.loc[~untimed]
+        students, _ = pd.factorize(df[id_column], sort=True)
+        items, labels = pd.factorize(df[item_column].astype(str), sort=True)
+        times = df[time_column].to_numpy(dtype=float)
+        return cls.from_arrays(students, times, items, labels)
+
+    @classmethod
+    def from_arrays(cls, students, times, items, labels):
+        """
+        Build the database from parallel per-row arrays.
+
+        Args:
+            students (np.ndarray): Integer student key of each row; sequences follow the order of the keys.
+            times (np.ndarray): Time group of each row, never NaN.
+            items (np.ndarray): Item code of each row, codes following the order of ``labels``.
+            labels (list): Item labels, sorted.
+
+        Returns:
+            SequenceDatabase: The encoded database (see `from_frame`).
+        """
+        order = np.lexsort((items, times, students))
+        students, times, items = students[order], times[order], items[order]
+
+        # Boundaries between consecutive rows of the sorted arrays
+        new_student = np.ones(len(order), dtype=bool)
+        new_student[1:] = students[1:] != students[:-1]
+        new_term = new_student.copy()
+        new_term[1:] |= times[1:] != times[:-1]
+        new_item = new_term.copy()
+        new_item[1:] |= items[1:] != items[:-1]
+
+        items = items[new_item]
+        term_starts = np.flatnonzero(new_term[new_item])
+        sequence_starts = np.flatnonzero(new_student[new_item][term_starts])
+
+        return cls(
+            items,
+            np.append(term_starts, len(items)),
+            np.append(sequence_starts, len(term_starts)),
+            labels,
+            times=times[new_item][term_starts],
+        )
+
+    @classmethod
+    def concatenate(cls, databases, labels):
+        """Return the sequences of several databases sharing the item dictionary ``labels``, back to back."""
+        databases = list(databases)
+        items, term_offsets, sequence_offsets = [], [np.zeros(1, dtype=np.int64)], [np.zeros(1, dtype=np.int64)]
+        item_count = term_count = 0
+        for database in databases:
+            items.append(database.items)
+            term_offsets.append(database.term_offsets[1:] + item_count)
+            sequence_offsets.append(database.sequence_offsets[1:] + term_count)
+            item_count += len(database.items)
+            term_count += len(database.term_offsets) - 1
+        weights = None
+        if any(database.weights is not None for database in databases):
+            weights = np.concatenate([database.sequence_weights() for database in databases])
+        times = None
+        if databases and all(database.times is not None for database in databases):
+            times = np.concatenate([database.times for database in databases])
+        return cls(np.concatenate(items or [np.zeros(0, dtype=np.int32)]), np.concatenate(term_offsets), np.concatenate(sequence_offsets), labels, weights, times)
+
+    def save(self, directory):
+        """Write the arrays as .npy files and the item dictionary as labels.json into an existing directory."""
+        for array_name in ('items', 'term_offsets', 'sequence_offsets', 'weights', 'times'):
+            if getattr(self, array_name) is not None:
+                np.save(path.join(directory, f"{array_name}.npy"), getattr(self, array_name))
+        with open(path.join(directory, 'labels.json'), 'w') as file:
+            json.dump(self.labels, file)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """Load a database written by `save`, memory-mapping its arrays unless ``mmap_mode`` is None."""
+        arrays = [np.load(path.join(directory, f"{array_name}.npy"), mmap_mode=mmap_mode) for array_name in ('items', 'term_offsets', 'sequence_offsets')]
+        optional = {}
+        for array_name in ('weights', 'times'):
+            array_path = path.join(directory, f"{array_name}.npy")
+            optional[array_name] = np.load(array_path, mmap_mode=mmap_mode) if path.exists(array_path) else None
+        with open(path.join(directory, 'labels.json')) as file:
+            labels = json.load(file)
+        return cls(*arrays, labels, **optional)
+
+    def __getstate__(self):
+        # The decoded sequences and times are a cache; workers rebuild them from the arrays
+        state = self.__dict__.copy()
+        state['_sequences'] = None
+        state['_term_times'] = None
+        return state
+
+    def __len__(self):
+        return len(self.sequence_offsets) - 1
+
+    def sequence_weights(self):
+        """Return the weight of every sequence, 1 for each sequence of a database that is not deduplicated."""
+        if self.weights is None:
+            return np.ones(len(self), dtype=np.int64)
+        return self.weights
+
+    def total_weight(self):
+        """Return the number of students the sequences stand for."""
+        return len(self) if self.weights is None else int(self.weights.sum())
+
+    def rank_times(self):
+        """
+        Replace the time of every term by its period: the rank of its time group among the distinct time groups
+        of the database, so that consecutive semesters (or months, ...) are one period apart whatever the
+        encoding of the time groups (e.g. 20123 then 20131).
+
+        Returns:
+            SequenceDatabase: The database with ranked times, sharing the other arrays.
+        """
+        if self.times is None:
+            return self
+        _, periods = np.unique(self.times, return_inverse=True)
+        ranked = SequenceDatabase(self.items, self.term_offsets, self.sequence_offsets, self.labels, self.weights, periods)
+        ranked._sequences = self._sequences
+        return ranked
+
+    def without_times(self):
+        """Return the database without its term times, sharing the other arrays."""
+        untimed = SequenceDatabase(self.items, self.term_offsets, self.sequence_offsets, self.labels, self.weights)
+        untimed._sequences = self._sequences
+        return untimed
+
+    def deduplicate(self):
+        """
+        Collapse identical sequences into one, weighted by the number of students following it. With term times,
+        sequences are identical when their terms are, and so are the periods between their terms.
+
+        Returns:
+            SequenceDatabase: The distinct sequences, in the order of their first occurrence, with their weights.
+        """
+        sequences = self.sequences
+        weights = self.sequence_weights().tolist()
+        keys = sequences
+        if self.times is not None:
+            keys = [(sequence, tuple(time - times[0] for time in times)) for sequence, times in zip(sequences, self.term_times)]
+        slots = {}
+        first, counts = [], []
+        for position, key in enumerate(keys):
+            slot = slots.get(key)
+            if slot is None:
+                slots[key] = len(first)
+                first.append(position)
+                counts.append(weights[position])
+            else:
+                counts[slot] += weights[position]
+
+        unique = self.take(first)
+        unique.weights = np.array(counts, dtype=np.int64)
+        unique._sequences = [sequences[position] for position in first]
+        if self.times is not None:
+            unique._term_times = [self.term_times[position] for position in first]
+        return unique
+
+    def reduce(self, keep_items, min_length):
+        """
+        Shrink the database for the next level of a mining run: strip the items not in ``keep_items``, drop the
+        terms left empty, and drop the sequences left with fewer than ``min_length`` items.
+
+        A sequence containing a pattern made only of kept items still contains it once reduced, so counting
+        those patterns over the reduced database gives the same supports.
+
+        Args:
+            keep_items (iterable): Item codes kept.
+            min_length (int): Number of items of the shortest pattern still to be counted.
+
+        Returns:
+            SequenceDatabase: The reduced database, sharing the item dictionary, with the weights of the kept sequences.
+        """
+        keep_mask = np.zeros(len(self.labels), dtype=bool)
+        keep_mask[np.fromiter(keep_items, dtype=np.int64)] = True
+        term_count = len(self.term_offsets) - 1
+        item_terms = np.repeat(np.arange(term_count), np.diff(self.term_offsets))
+        term_sequences = np.repeat(np.arange(len(self)), np.diff(self.sequence_offsets))
+
+        kept = keep_mask[self.items]
+        term_sizes = np.bincount(item_terms[kept], minlength=term_count)
+        sequence_sizes = np.bincount(term_sequences, weights=term_sizes, minlength=len(self))
+        kept_sequences = sequence_sizes >= min_length
+        kept_terms = (term_sizes > 0) & kept_sequences[term_sequences]
+        kept &= kept_terms[item_terms]
+
+        return SequenceDatabase(
+            self.items[kept],
+            np.append(0, np.cumsum(term_sizes[kept_terms])),
+            np.append(0, np.cumsum(np.bincount(term_sequences[kept_terms], minlength=len(self))[kept_sequences])),
+            self.labels,
+            None if self.weights is None else self.weights[kept_sequences],
+            None if self.times is None else self.times[kept_terms],
+        )
+
+    def shard(self, start, stop):
+        """Return the sequences ``start`` to ``stop - 1`` as a database sharing the same item dictionary."""
+        first_term, last_term = self.sequence_offsets[start], self.sequence_offsets[stop]
+        first_item, last_item = self.term_offsets[first_term], self.term_offsets[last_term]
+        return SequenceDatabase(
+            self.items[first_item:last_item],
+            self.term_offsets[first_term:last_term + 1] - first_item,
+            self.sequence_offsets[start:stop + 1] - first_term,
+            self.labels,
+            None if self.weights is None else self.weights[start:stop],
+            None if self.times is None else self.times[first_term:last_term],
+        )
+
+    def take(self, order):
+        """Return a database made of the sequences at the positions ``order``, in that order."""
+        order = np.asarray(order, dtype=np.int64)
+        term_counts = np.diff(self.sequence_offsets)[order]
+        sequence_offsets = np.append(0, np.cumsum(term_counts))
+        terms = _ranges(self.sequence_offsets[order], term_counts, sequence_offsets)
+        item_counts = np.diff(self.term_offsets)[terms]
+        term_offsets = np.append(0, np.cumsum(item_counts))
+        items = self.items[_ranges(self.term_offsets[terms], item_counts, term_offsets)]
+        return SequenceDatabase(
+            items, term_offsets, sequence_offsets, self.labels,
+            None if self.weights is None else self.weights[order],
+            None if self.times is None else self.times[terms],
+        )
+
+    @property
+    def sequences(self):
+        """List of sequences as tuples of terms, materialized once for the pure-Python counting loops."""
+        if self._sequences is None:
+            items = self.items.tolist()
+            term_offsets = self.term_offsets.tolist()
+            terms = [tuple(items[term_offsets[t]:term_offsets[t + 1]]) for t in range(len(term_offsets) - 1)]
+            sequence_offsets = self.sequence_offsets.tolist()
+            self._sequences = [tuple(terms[sequence_offsets[s]:sequence_offsets[s + 1]]) for s in range(len(self))]
+        return self._sequences
+
+    @property
+    def term_times(self):
+        """List of the term times of every sequence, parallel to `sequences`."""
+        if self._term_times is None:
+            times = self.times.tolist()
+            sequence_offsets = self.sequence_offsets.tolist()
+            self._term_times = [tuple(times[sequence_offsets[s]:sequence_offsets[s + 1]]) for s in range(len(self))]
+        return self._term_times
+
+    def item_supports(self):
+        """Return a dict mapping each item code to the number of sequences (the total weight of those) containing it."""
+        term_sequence_ids = np.repeat(np.arange(len(self)), np.diff(self.sequence_offsets))
+        item_sequence_ids = np.repeat(term_sequence_ids, np.diff(self.term_offsets))
+        pairs = np.unique(np.stack([item_sequence_ids, self.items]), axis=1)
+        if self.weights is None:
+            codes, counts = np.unique(pairs[1], return_counts=True)
+        else:
+            codes, inverse = np.unique(pairs[1], return_inverse=True)
+            counts = np.bincount(inverse, weights=self.weights[pairs[0]], minlength=len(codes)).astype(np.int64)
+        return dict(zip(codes.tolist(), counts.tolist()))
+
+    def format_pattern(self, pattern):
+        """Return the export form of a pattern, e.g. ``"MATH1001,MATH1002|PHYS1501"``."""
+        return '|'.join(','.join(self.labels[item] for item in term) for term in pattern)
+
+    def decode_results(self, results_dict):
+        """Convert the pattern keys of a ``{level: {pattern: count}}`` results dict to their export form."""
+        return {
+            level: {self.format_pattern(pattern): count for pattern, count in counts.items()}
+            for level, counts in results_dict.items()
+        }
+
+    def to_strings(self):
+        """Return every sequence in its export form."""
+        return [self.format_pattern(sequence) for sequence in self.sequences]
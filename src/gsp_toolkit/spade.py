@@ -0,0 +1,121 @@
+import numpy as np
+from bisect import bisect_right
+from collections import defaultdict
+
+def build_id_lists(sequence_db):
+    """
+    Build the vertical layout of a sequence database.
+
+    Args:
+        sequence_db (SequenceDatabase): Encoded sequence database.
+
+    Returns:
+        dict: Maps each item code to its id-list, a dict of sequence id -> sorted term indices in which
+        the item occurs.
+    """
+    term_sequence_ids = np.repeat(np.arange(len(sequence_db)), np.diff(sequence_db.sequence_offsets))
+    term_index = np.arange(len(term_sequence_ids)) - sequence_db.sequence_offsets[:-1][term_sequence_ids]
+    term_sizes = np.diff(sequence_db.term_offsets)
+
+    items = sequence_db.items
+    sequence_ids = np.repeat(term_sequence_ids, term_sizes)
+    term_ids = np.repeat(term_index, term_sizes)
+    order = np.lexsort((term_ids, sequence_ids, items))
+
+    id_lists = defaultdict(dict)
+    for item, sid, tid in zip(items[order].tolist(), sequence_ids[order].tolist(), term_ids[order].tolist()):
+        id_lists[item].setdefault(sid, []).append(tid)
+    return id_lists
+
+def temporal_join(prefix_list, item_list):
+    """
+    Join for a sequence extension (the item in a later term than the prefix's last term).
+
+    Keeps, per sequence, the occurrences of the item after the earliest end of the prefix.
+    """
+    if len(item_list) < len(prefix_list):
+        pairs = ((sid, prefix_list.get(sid), tids) for sid, tids in item_list.items())
+    else:
+        pairs = ((sid, tids, item_list.get(sid)) for sid, tids in prefix_list.items())
+
+    joined = {}
+    for sid, prefix_tids, item_tids in pairs:
+        if prefix_tids and item_tids:
+            index = bisect_right(item_tids, prefix_tids[0])
+            if index < len(item_tids):
+                joined[sid] = item_tids[index:]
+    return joined
+
+def equality_join(prefix_list, item_list):
+    """Join for an itemset extension (the item in the same term as the prefix's last item)."""
+    if len(item_list) < len(prefix_list):
+        prefix_list, item_list = item_list, prefix_list
+
+    joined = {}
+    for sid, prefix_tids in prefix_list.items():
+        item_tids = item_list.get(sid)
+        if item_tids:
+            common = [tid for tid in prefix_tids if tid in item_tids]
+            if common:
+                joined[sid] = common
+    return joined
+
+def spade_algorithm(sequence_db, min_support, max_length=None):
+    """
+    Mine frequent sequences with vertical id-list joins (SPADE-style) instead of rescanning the database
+    at every level. Patterns are grown depth-first from each frequent item, and an extension is only
+    tried if it was frequent for the parent pattern.
+
+    Args:
+        sequence_db (SequenceDatabase): Encoded sequence database.
+        min_support (float): Minimum support threshold.
+        max_length (int): Longest sequences mined, in items; patterns of that length are not extended.
+
+    Returns:
+        dict: A dictionary containing frequent itemsets of two or more items and their counts, by level.
+    """
+    id_lists = build_id_lists(sequence_db)
+    weights = None if sequence_db.weights is None else sequence_db.weights.tolist()
+
+    def support(id_list):
+        # Number of sequences in the id-list, or the students they stand for once deduplicated
+        return len(id_list) if weights is None else sum(weights[sid] for sid in id_list)
+
+    frequent_items = sorted(item for item, id_list in id_lists.items() if support(id_list) >= min_support)
+    results_dict = defaultdict(dict)
+
+    def extend(pattern, id_list, length, s_items, i_items):
+        if max_length is not None and length >= max_length:
+            return
+        s_children = []
+        for item in s_items:
+            joined = temporal_join(id_list, id_lists[item])
+            count = support(joined)
+            if count >= min_support:
+                s_children.append((item, joined, count))
+
+        i_children = []
+        for item in i_items:
+            joined = equality_join(id_list, id_lists[item])
+            count = support(joined)
+            if count >= min_support:
+                i_children.append((item, joined, count))
+
+        s_frequent = [item for item, _, _ in s_children]
+        i_frequent = [item for item, _, _ in i_children]
+        column_name = f"Freq {length + 1}-Itemsets"
+
+        for item, joined, count in s_children:
+            child = pattern + ((item,),)
+            results_dict[column_name][child] = count
+            extend(child, joined, length + 1, s_frequent, [other for other in s_frequent if other > item])
+
+        for item, joined, count in i_children:
+            child = pattern[:-1] + (pattern[-1] + (item,),)
+            results_dict[column_name][child] = count
+            extend(child, joined, length + 1, s_frequent, [other for other in i_frequent if other > item])
+
+    for item in frequent_items:
+        extend(((item,),), id_lists[item], 1, frequent_items, [other for other in frequent_items if other > item])
+
+    return dict(results_dict)
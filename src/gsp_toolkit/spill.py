@@ -0,0 +1,96 @@
+from collections.abc import Mapping
+from os import path, makedirs
+from tempfile import mkdtemp
+import numpy as np
+
+class SpilledResults(Mapping):
+    """
+    Mining results kept on disk, one file per level, read back one level at a time.
+
+    Behaves as the usual read-only ``{level: {pattern: count}}`` results dict, so filtering, exporting
+    and summarizing work unchanged while only the level being read is in memory. A level of k-item
+    patterns is stored compactly as three arrays: the item codes (n x k), the index of the term each
+    item is in (n x k) and the counts (n).
+
+    Views made with `filtered` and `decoded` share the files and apply a min support or turn patterns
+    into their export form when a level is read. The files live as long as the directory does.
+
+    Args:
+        directory (str): Directory holding the level files.
+        levels (list): (level name, file path) pairs, in level order.
+        min_support (float): Patterns below this support are left out when reading.
+        labels (list): Item labels; when given, patterns are read in their export form.
+    """
+
+    def __init__(self, directory, levels=None, min_support=None, labels=None):
+        self.directory = directory
+        self.levels = list(levels or [])
+        self.min_support = min_support
+        self.labels = labels
+
+    @classmethod
+    def create(cls, spill_dir):
+        """Return empty results spilled to a new folder of ``spill_dir``."""
+        makedirs(spill_dir, exist_ok=True)
+        return cls(mkdtemp(prefix='levels_', dir=spill_dir))
+
+    def write(self, level, itemset_count):
+        """Write one level of ``{pattern: count}`` to disk."""
+        patterns = list(itemset_count)
+        length = sum(len(term) for term in patterns[0]) if patterns else 0
+        items = np.array([item for pattern in patterns for term in pattern for item in term], dtype=np.int32)
+        terms = np.array([j for pattern in patterns for j, term in enumerate(pattern) for _ in term], dtype=np.int32)
+        counts = np.fromiter(itemset_count.values(), dtype=np.int64, count=len(patterns))
+
+        file_path = path.join(self.directory, f"level_{len(self.levels)}.npz")
+        np.savez(file_path, items=items.reshape(len(patterns), length), terms=terms.reshape(len(patterns), length), counts=counts)
+        self.levels.append((level, file_path))
+
+    def filtered(self, min_support):
+        """Return a view of the patterns meeting ``min_support``."""
+        if self.min_support is not None:
+            min_support = max(min_support, self.min_support)
+        return SpilledResults(self.directory, self.levels, min_support, self.labels)
+
+    def decoded(self, labels):
+        """Return a view with patterns in their export form, e.g. ``"MATH1001,MATH1002|PHYS1501"``."""
+        return SpilledResults(self.directory, self.levels, self.min_support, labels)
+
+    def _keep(self, counts):
+        if self.min_support is None:
+            return np.ones(len(counts), dtype=bool)
+        return counts >= self.min_support
+
+    def __getitem__(self, level):
+        file_path = dict(self.levels)[level]
+        with np.load(file_path) as arrays:
+            keep = self._keep(arrays['counts'])
+            items, terms, counts = arrays['items'][keep].tolist(), arrays['terms'][keep].tolist(), arrays['counts'][keep].tolist()
+
+        itemset_count = {}
+        for pattern_items, pattern_terms, count in zip(items, terms, counts):
+            pattern = [[] for _ in range(pattern_terms[-1] + 1)]
+            for item, term in zip(pattern_items, pattern_terms):
+                pattern[term].append(item)
+            if self.labels is None:
+                key = tuple(tuple(term) for term in pattern)
+            else:
+                key = '|'.join(','.join(self.labels[item] for item in term) for term in pattern)
+            itemset_count[key] = count
+        return itemset_count
+
+    def __iter__(self):
+        # Levels left without any pattern at the min support are dropped, as `filter_results` does
+        for level, file_path in self.levels:
+            if self.min_support is None:
+                yield level
+            else:
+                with np.load(file_path) as arrays:
+                    if self._keep(arrays['counts']).any():
+                        yield level
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, level):
+        return level in iter(self)
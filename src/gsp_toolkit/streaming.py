@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+from os import path
+from tempfile import TemporaryDirectory
+from sequence_db import SequenceDatabase
+from utils import parse_date_values, timegroup_column, enrollment_filter_columns, filter_enrollments
+
+# One spilled row: provisional student and item codes, time group and department index
+_ROW = np.dtype([('student', '<i8'), ('time', '<f8'), ('item', '<i8'), ('department', '<i4')])
+
+class CsvSource:
+    """
+    Enrollment CSV read in chunks instead of being loaded whole, for files larger than memory.
+
+    Each chunk is filtered to the requested departments, its items and students are encoded on the fly,
+    and its rows are spilled to temporary files partitioned on the student. The partitions are then
+    turned into sequences one at a time, so only the encoded rows of one partition are held in memory
+    besides the sequence databases being built. Pass it to `execute_tool` in place of a DataFrame.
+
+    The file must hold ID and Item columns, a Department column for course data, and either a TimeGroup
+    column or an EventTime column (grouped by `timegroup_unit`, or one term per distinct date without it).
+
+    Args:
+        file_path (str): Path of the CSV file.
+        chunksize (int): Number of rows read at a time.
+        timegroup_unit (str): Unit used to group EventTime into terms (see `create_timegroup`).
+        partitions (int): Number of temporary files the rows are partitioned into.
+        temp_dir (str): Directory of the temporary files. Default: the system temporary directory.
+    """
+
+    def __init__(self, file_path, chunksize=1_000_000, timegroup_unit=None, partitions=64, temp_dir=None):
+        self.file_path = file_path
+        self.chunksize = chunksize
+        self.timegroup_unit = timegroup_unit
+        self.partitions = partitions
+        self.temp_dir = temp_dir
+        self.columns = pd.read_csv(file_path, nrows=0).columns.tolist()
+
+        if 'TimeGroup' in self.columns:
+            self.time_column = 'TimeGroup'
+        elif 'EventTime' in self.columns:
+            self.time_column = 'EventTime'
+        else:
+            raise ValueError("Streamed input needs a TimeGroup or an EventTime column.")
+
+    def _chunk_times(self, chunk, time_cache):
+        """Return the time group of every row of a chunk, parsing each distinct EventTime once per file."""
+        if self.time_column == 'TimeGroup':
+            return pd.to_numeric(chunk['TimeGroup']).to_numpy(dtype=float)
+
+        codes, values = pd.factorize(chunk['EventTime'])
+        new_values = [value for value in values if value not in time_cache]
+        if new_values:
+            time_cache.update(zip(new_values, parse_date_values(new_values).to_numpy()))
+        distinct_dates = np.array([time_cache[value] for value in values] + [np.datetime64('NaT')], dtype='datetime64[ns]')
+        dates = pd.DatetimeIndex(distinct_dates[codes])
+        if self.timegroup_unit:
+            return timegroup_column(dates, self.timegroup_unit)
+        return np.where(dates.isna(), np.nan, dates.asi8.astype(float))
+
+    def _spill(self, departments, separate, spill_path, enrollment_filters):
+        """Read the file chunk by chunk and spill the encoded rows, returning the student ids and item labels."""
+        student_codes = {}
+        item_codes = {}
+        time_cache = {}
+        untimed_rows = 0
+        department_index = {department: i for i, department in enumerate(departments)}
+        usecols = ['ID', 'Item', self.time_column] + (['Department'] if separate else []) + enrollment_filter_columns(enrollment_filters, self.columns)
+
+        for chunk in pd.read_csv(self.file_path, usecols=usecols, chunksize=self.chunksize):
+            # Same filters as `dataframe_gen`
+            selected = chunk['Item'].astype(str).str[:4].isin(departments)
+            if separate:
+                selected &= chunk['Department'].isin(departments)
+            chunk = filter_enrollments(chunk, enrollment_filters, selected)
+            if chunk.empty:
+                continue
+
+            # Rows without a time group belong to no term, as in `SequenceDatabase.from_frame`
+            times = self._chunk_times(chunk, time_cache)
+            timed = ~np.isnan(times)
+            if not timed.all():
+                untimed_rows += int((~timed).sum())
+                chunk, times = chunk.loc[timed], times[timed]
+                if chunk.empty:
+                    continue
+
+            rows = np.empty(len(chunk), dtype=_ROW)
+            codes, values = pd.factorize(chunk['ID'])
+            rows['student'] = np.array([student_codes.setdefault(value, len(student_codes)) for value in values])[codes]
+            codes, values = pd.factorize(chunk['Item'].astype(str))
+            rows['item'] = np.array([item_codes.setdefault(value, len(item_codes)) for value in values])[codes]
+            rows['time'] = times
+            rows['department'] = chunk['Department'].map(department_index).to_numpy() if separate else 0
+
+            partition = rows['student'] % self.partitions
+            for p in np.unique(partition).tolist():
+                with open(path.join(spill_path, f"{p}.bin"), 'ab') as file:
+                    rows[partition == p].tofile(file)
+
+        if untimed_rows:
+            print(f"Warning: {untimed_rows} rows without a time group were dropped.")
+        return list(student_codes), list(item_codes)
+
+    def sequence_databases(self, departments, separate, enrollment_filters=None):
+        """
+        Encode the file into sequence databases.
+
+        Args:
+            departments (list): Department codes to keep.
+            separate (bool): Build one database per department, as `dataframe_gen` does in "separate" mode.
+            enrollment_filters (dict): Grade and credit predicates applied to every chunk (see `filter_enrollments`).
+
+        Returns:
+            dict: Maps each department (or None when not separate) to its `SequenceDatabase`, one sequence
+            per student in sorted id order, with only the items of the department in its item dictionary.
+        """
+        with TemporaryDirectory(dir=self.temp_dir) as spill_path:
+            student_ids, item_labels = self._spill(departments, separate, spill_path, enrollment_filters)
+
+            # Final codes follow the sorted order of the ids and labels
+            student_rank = np.empty(len(student_ids), dtype=np.int64)
+            student_rank[pd.Index(student_ids).argsort()] = np.arange(len(student_ids))
+            item_rank = np.empty(len(item_labels), dtype=np.int64)
+            item_rank[np.argsort(item_labels)] = np.arange(len(item_labels))
+            labels = sorted(item_labels)
+
+            groups = list(departments) if separate else [None]
+            parts = {group: [] for group in groups}
+            keys = {group: [] for group in groups}
+            for p in range(self.partitions):
+                partition_file = path.join(spill_path, f"{p}.bin")
+                if not path.exists(partition_file):
+                    continue
+                rows = np.fromfile(partition_file, dtype=_ROW)
+                for i, group in enumerate(groups):
+                    selected = rows[rows['department'] == i] if separate else rows
+                    students = student_rank[selected['student']]
+                    parts[group].append(SequenceDatabase.from_arrays(students, selected['time'], item_rank[selected['item']], labels))
+                    keys[group].append(np.unique(students))
+
+        databases = {}
+        for group in groups:
+            merged = SequenceDatabase.concatenate(parts[group], labels)
+            merged = merged.take(np.argsort(np.concatenate(keys[group] or [np.zeros(0, dtype=np.int64)])))
+            databases[group] = _compact_labels(merged)
+        return databases
+
+def _compact_labels(sequence_db):
+    """Drop the item labels a database does not use, re-encoding its items."""
+    used = np.unique(sequence_db.items)
+    return SequenceDatabase(
+        np.searchsorted(used, sequence_db.items),
+        sequence_db.term_offsets,
+        sequence_db.sequence_offsets,
+        [sequence_db.labels[item] for item in used.tolist()],
+        times=sequence_db.times,
+    )
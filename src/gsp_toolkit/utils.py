@@ -4,6 +4,10 @@ import json
 import pandas as pd
 import numpy as np
 import dateparser
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
 from hashlib import md5
 from os import path, makedirs
 
@@ -42,8 +46,11 @@ def filter_and_export_to_csv(data_dict, min_support, total_transactions, file_na
     """
     Filters and exports the provided data to a CSV file.
 
+    The CSV is written one level at a time, so only one level of itemsets is held as a DataFrame; the
+    levels of a `SpilledResults` are read from disk as they are written.
+
     Args:
-        data_dict (dict): Dictionary containing the data to be exported.
+        data_dict (dict): Dictionary containing the data to be exported, by level.
         min_support (float): Minimum support threshold.
         total_transactions (int): Total number of transactions in the data.
         file_name (str): Name of the CSV file to which data will be exported.
@@ -51,15 +58,25 @@ def filter_and_export_to_csv(data_dict, min_support, total_transactions, file_na
     Returns:
         dict: A dictionary containing the counts of itemsets.
     """
-    data_df = pd.DataFrame(data_dict)
-   
-    for column in data_df:
-        data_df.drop(data_df[data_df[column] < min_support].index, inplace=True)
-    
-    itemset_counts = data_df.count().to_dict()
-    data_df['Count %'] = (data_df.sum(axis=1) / total_transactions) * 100
-    data_df.to_csv(file_name)
-    
+    levels = list(data_dict)
+    if not levels:
+        pd.DataFrame(columns=['Count %']).to_csv(file_name)
+        return {}
+
+    itemset_counts = {}
+    with open(file_name, 'w', newline='') as file:
+        for index, level in enumerate(levels):
+            counts = pd.Series(data_dict[level], dtype='int64')
+            counts = counts[counts >= min_support]
+            itemset_counts[level] = len(counts)
+
+            # Same layout as one DataFrame of every level: a column per level, empty outside the itemset's own
+            level_df = pd.DataFrame({level: counts}).reindex(columns=levels)
+            if len(levels) > 1:
+                level_df = level_df.astype(float)
+            level_df['Count %'] = (level_df.sum(axis=1) / total_transactions) * 100
+            level_df.to_csv(file, header=index == 0)
+
     return itemset_counts
 
 def export_summary_to_file(single_item_count, itemset_count, total_transactions, elapsed_time, file_path):
@@ -105,38 +122,185 @@ def get_data_dictionary():
     
     return field_info
 
+# Grades of courses not passed: failed, withdrawn or left incomplete
+FAILING_GRADES = ('F', 'E', 'WF', 'NP', 'U', 'W', 'I')
+
+def enrollment_filter_columns(filters, columns=None):
+    """
+    Return the optional columns read by the enrollment filters (see `filter_enrollments`).
+
+    Raises:
+        ValueError: If ``columns`` is given and lacks one of them.
+    """
+    filters = filters or {}
+    needed = []
+    if filters.get('passing_only') or filters.get('grade_buckets'):
+        needed.append('FinalGrade')
+    if filters.get('min_grade') is not None:
+        needed.append('FinalGradeN')
+    if filters.get('min_credit_hours') is not None:
+        needed.append('CreditHours')
+    missing = [column for column in needed if columns is not None and column not in columns]
+    if missing:
+        raise ValueError(f"The enrollment filters need the {', '.join(missing)} column(s) of the input")
+    return needed
+
+def filter_enrollments(df, filters, mask=None):
+    """
+    Keep the enrollment rows meeting the filters, with vectorized predicates over the grade and credit columns.
+    Grades are compared once per distinct value and mapped back to the rows.
+
+    Args:
+        df (DataFrame): One row per course taken.
+        filters (dict): Any of:
+            - "passing_only" (bool): keep the rows whose FinalGrade is not a failing grade (see `FAILING_GRADES`).
+            - "min_grade" (float): keep the rows whose FinalGradeN is at least this value.
+            - "min_credit_hours" (float): keep the rows whose CreditHours is at least this value.
+            - "grade_buckets" (bool): tag each item with the letter of its FinalGrade, e.g. "MATH1001:A" for an A-,
+              so the same course passed with different grades makes different items.
+            Rows without the value a predicate reads do not meet it; items without a grade are not tagged.
+        mask (pd.Series): Rows already selected, e.g. by department, combined with the predicates so the rows
+            are only copied once.
+
+    Returns:
+        DataFrame: The rows kept, with tagged items if asked.
+    """
+    filters = filters or {}
+    enrollment_filter_columns(filters, df.columns)
+
+    keep = np.ones(len(df), dtype=bool) if mask is None else np.array(mask, dtype=bool)
+    if filters.get('passing_only'):
+        codes, grades = pd.factorize(df['FinalGrade'])
+        passing = ~pd.Index(grades.astype(str)).str.strip().str.upper().isin(FAILING_GRADES)
+        keep &= np.append(passing, False)[codes]
+    for option, column in (('min_grade', 'FinalGradeN'), ('min_credit_hours', 'CreditHours')):
+        if filters.get(option) is not None:
+            keep &= (pd.to_numeric(df[column], errors='coerce') >= filters[option]).to_numpy()
+    if not keep.all():
+        df = df.loc[keep]
+
+    if filters.get('grade_buckets'):
+        codes, grades = pd.factorize(df['FinalGrade'])
+        buckets = ':' + pd.Index(grades.astype(str)).str.strip().str.upper().str.rstrip('+-')
+        df = df.assign(Item=df['Item'].astype(str) + np.append(np.asarray(buckets, dtype=object), '')[codes])
+    return df
+
 def generate_hash(input_string):
     """Generate a unique hash from an input string."""
     return md5(input_string.encode()).hexdigest()
 
-def create_timegroup(df, time_column, timegroup_unit):
+def generate_file_hash(file_path, block_size=1 << 20):
+    """Generate a hash of the contents of a file, read in blocks."""
+    file_hash = md5()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+def timegroup_values(dates, timegroup_unit):
     """
-    Create a TimeGroup column based on the specified timegroup unit.
+    Compute the time group of each date.
 
     Args:
-        df (pd.DataFrame): The dataframe containing the time column.
-        time_column (str): The column name containing the time data (must be in datetime format).
+        dates (pd.DatetimeIndex): Dates, possibly with NaT.
         timegroup_unit (str): The unit of time to group by (e.g., 'Y' for Year, 'M' for Month, 'W' for Week, 'Q' for Quarter).
 
     Returns:
-        pd.DataFrame: The dataframe with the new 'TimeGroup' column added.
+        np.ndarray: The time groups, as floats with NaN where the date is NaT.
     """
     if timegroup_unit == 'Y':
-        df['TimeGroup'] = df[time_column].dt.year
+        groups = dates.year
     elif timegroup_unit == 'M':
-        df['TimeGroup'] = df[time_column].dt.year * 100 + df[time_column].dt.month
+        groups = dates.year * 100 + dates.month
     elif timegroup_unit == 'W':
-        df['TimeGroup'] = df[time_column].dt.isocalendar().year * 100 + df[time_column].dt.isocalendar().week
+        calendar = dates.isocalendar()
+        groups = calendar['year'] * 100 + calendar['week']
     elif timegroup_unit == 'Q':
-        df['TimeGroup'] = df[time_column].dt.year * 10 + df[time_column].dt.quarter
+        groups = dates.year * 10 + dates.quarter
     else:
         raise ValueError(f"Unsupported time group unit: {timegroup_unit}")
+
+    return np.asarray(groups, dtype=float)
+
+def timegroup_column(dates, timegroup_unit):
+    """
+    Compute the time group of every row of a column of dates (see `timegroup_values`).
+
+    Enrollment tables only hold a handful of distinct term dates, so the calendar fields are derived once
+    per distinct date and mapped back to the rows.
+
+    Args:
+        dates (pd.Series or pd.DatetimeIndex): Date of each row, possibly NaT.
+        timegroup_unit (str): The unit of time to group by (e.g., 'Y' for Year, 'M' for Month, 'W' for Week, 'Q' for Quarter).
+
+    Returns:
+        np.ndarray: The time group of each row, as floats with NaN where the date is NaT.
+    """
+    codes, distinct_dates = pd.factorize(dates)
+    groups = timegroup_values(pd.DatetimeIndex(distinct_dates), timegroup_unit)
+    return np.append(groups, np.nan)[codes]
+
+def create_timegroup(df, time_column, timegroup_unit):
+    """
+    Create a TimeGroup column based on the specified timegroup unit.
+
+    Args:
+        df (pd.DataFrame): The dataframe containing the time column.
+        time_column (str): The column name containing the time data (must be in datetime format).
+        timegroup_unit (str): The unit of time to group by (e.g., 'Y' for Year, 'M' for Month, 'W' for Week, 'Q' for Quarter).
+
+    Returns:
+        pd.DataFrame: The dataframe with the new 'TimeGroup' column added.
+    """
+    groups = timegroup_column(df[time_column], timegroup_unit)
+
+    if np.isnan(groups).any():
+        # Rows without a date get a NaN time group, as `.dt` would give them
+        df['TimeGroup'] = groups
+    else:
+        df['TimeGroup'] = groups.astype(np.int64)
     
     save_path = path.join(path.dirname(__file__), '..', '..', 'data')
     df = save_to_folder(df, save_path, 'preprocessed_data.csv')
     
     return df, save_path + '/preprocessed_data.csv'
 
+# Values already parsed by `dateparser`, shared across columns and calls
+_dateparser_cache = {}
+
+def _dateparser_parse(value):
+    """Parse a single value with `dateparser`, caching the result."""
+    if value not in _dateparser_cache:
+        _dateparser_cache[value] = dateparser.parse(value)
+    return _dateparser_cache[value]
+
+def parse_date_values(values, sample_size=20):
+    """
+    Parse an array of distinct date strings.
+
+    A format is inferred from a sample of the values; if it is consistent, every value is parsed with a
+    vectorized `pd.to_datetime`, and only the values it could not parse go through `dateparser`.
+
+    Args:
+        values (array-like): Distinct non-null date strings.
+        sample_size (int): Number of values used to infer the format.
+
+    Returns:
+        pd.DatetimeIndex: Parsed dates aligned with `values`, NaT where nothing could parse them.
+    """
+    values = pd.Index(values).astype(str)
+    parsed = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[ns]')
+
+    formats = {guess_datetime_format(value) for value in values[:sample_size]}
+    if len(formats) == 1 and None not in formats:
+        parsed[:] = pd.to_datetime(values, format=formats.pop(), errors='coerce').to_numpy(dtype='datetime64[ns]')
+
+    for i in np.flatnonzero(np.isnat(parsed)):
+        fallback = _dateparser_parse(values[i])
+        if fallback is not None:
+            parsed[i] = np.datetime64(fallback.replace(tzinfo=None), 'ns')
+    return pd.DatetimeIndex(parsed)
+
 def detect_date_columns_with_dateparser(df):
     """
     Use `dateparser` to detect columns that contain date-like values.
@@ -144,27 +308,29 @@ def detect_date_columns_with_dateparser(df):
     exclude_columns = ['ID', 'id', 'Item']
     date_columns = []
 
-    df_copy = df.copy()
-    
-    for col in df_copy.columns:
+    for col in df.columns:
         if col not in exclude_columns:
             # Try parsing the first 10 non-null values in each column using `dateparser`
-            if df_copy[col].dropna().head(10).apply(lambda x: dateparser.parse(str(x)) is not None).any():
+            if any(_dateparser_parse(str(x)) is not None for x in df[col].dropna().head(10)):
                 date_columns.append(col)
     
     return date_columns
 
 def parse_dates(df, column_name):
     """
-    Parse dates dynamically using `dateparser`.
-    Handles various formats such as slashes, hyphens, and different day-month orders.
+    Parse dates dynamically, handling various formats such as slashes, hyphens, and different day-month orders.
+    Each distinct value is parsed once (see `parse_date_values`), which is what makes large tables with a
+    few dozen distinct term dates cheap to parse.
     """
     # Replace empty strings with NaN for clean parsing
     df[column_name] = df[column_name].replace('', np.nan)
 
-    # Parse the dates dynamically using `dateparser` to handle all formats
-    df['EventTime'] = df[column_name].apply(lambda x: dateparser.parse(x) if pd.notna(x) else np.nan)
-    df['EventTime'] = pd.to_datetime(df['EventTime'])
+    if pd.api.types.is_datetime64_any_dtype(df[column_name]):
+        df['EventTime'] = df[column_name]
+    else:
+        codes, uniques = pd.factorize(df[column_name])
+        parsed = parse_date_values(uniques)
+        df['EventTime'] = pd.Series(parsed.take(codes, allow_fill=True, fill_value=pd.NaT), index=df.index)
 
     # Check if any values remain unparsed (NaT) and log them
     if df['EventTime'].isna().sum() > 0:
@@ -218,7 +384,17 @@ def get_timegroup_unit(gui=False):
         timegroup_unit = input("Enter the time unit: ")
     return timegroup_unit.strip().upper()
 
-def preprocess_time(df, concurrency=False, gui=False):
+def choose_time_column(df, gui=False):
+    """
+    Return the column holding the time of each row, prompting the user when several columns look like one.
+
+    Args:
+        df (DataFrame): The input rows; a sample of them is enough to detect date-like columns.
+        gui (bool): Whether to prompt the user in the tkinter GUI.
+
+    Returns:
+        str: Name of the time column.
+    """
     # hardcoded column names
     potential_date_columns = [col for col in df.columns if 'year' in col.lower() or 'semester' in col.lower()]
     # potential column names
@@ -251,19 +427,41 @@ def preprocess_time(df, concurrency=False, gui=False):
     else:
         column_name = potential_date_columns[0]
 
+    return column_name
+
+def preprocess_time(df, concurrency=False, gui=False, column_name=None, ordered_values=None):
+    """
+    Build the EventTime column from the time column of the input, saving the result to data/preprocessed_data.csv.
+
+    Args:
+        df (DataFrame): The input rows.
+        concurrency (bool): Unused, kept for compatibility.
+        gui (bool): Whether to prompt the user in the tkinter GUI.
+        column_name (str): The time column (see `choose_time_column`); the user is prompted when None.
+        ordered_values (list): Values of a semester column from earliest to latest (see `get_ordering`);
+            the user is prompted when None.
+
+    Returns:
+        tuple: The DataFrame with its EventTime column, and the path it was saved to.
+    """
+    if column_name is None:
+        column_name = choose_time_column(df, gui=gui)
+
     # Handle columns that do not contain numbers (e.g., 'Spring', 'Fall') not just objects
     if column_name.lower() == 'semester':
-        unique_values = df[column_name].unique()
-        ordered_values = get_ordering(unique_values, gui=gui)  # Prompt user for ordering (e.g., ['Spring', 'Summer', 'Fall'])
+        if ordered_values is None:
+            unique_values = df[column_name].unique()
+            ordered_values = get_ordering(unique_values, gui=gui)  # Prompt user for ordering (e.g., ['Spring', 'Summer', 'Fall'])
         num_unique_values = len(ordered_values)
         month_step = 12 // num_unique_values  # Distribute evenly across 12 months
         value_to_month = {val: (i * month_step + 1) for i, val in enumerate(ordered_values)}
         
+        months = df[column_name].map(value_to_month).fillna(1).astype(int)
         if 'Year' in df.columns:
-            df['EventTime'] = df.apply(lambda row: pd.Timestamp(f"{row['Year']}-{value_to_month.get(row[column_name], 1)}-01"), axis=1)
+            years = pd.to_numeric(df['Year'])
         else:
-            default_year = 2000
-            df['EventTime'] = df.apply(lambda row: pd.Timestamp(f"{default_year}-{value_to_month.get(row[column_name], 1)}-01"), axis=1)
+            years = 2000
+        df['EventTime'] = pd.to_datetime(pd.DataFrame({'year': years, 'month': months, 'day': 1}, index=df.index))
     
     else:
         # Apply the date parsing using `dateparser` for regular date columns
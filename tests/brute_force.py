@@ -0,0 +1,141 @@
+"""
+Brute-force reference for the mining engines: hand-built enrollment histories, a naive subsequence
+matcher following the GSP definitions, and an exhaustive search of the frequent patterns.
+
+Histories map each student to a list of (time, items) terms, e.g. ``[(1, "ab"), (3, "c")]``, with
+single-letter items. Patterns are tuples of terms, each a sorted tuple of items: ``(("a", "b"), ("c",))``.
+"""
+import random
+import pandas as pd
+from sequence_db import SequenceDatabase
+
+# Times are dense (every period from 1 up is used), so they match the periods of `SequenceDatabase.rank_times`
+CLASSIC = {
+    's1': [(1, "cd"), (2, "abc"), (3, "abf"), (4, "acdf")],
+    's2': [(1, "abf"), (2, "e")],
+    's3': [(1, "abf")],
+    's4': [(2, "dgh"), (3, "bf"), (4, "agh")],
+    's5': [(1, "a"), (2, "ab"), (4, "b")],
+    's6': [(1, "ac"), (3, "bd"), (5, "af")],
+    's7': [(2, "b"), (3, "a"), (4, "bf"), (5, "c")],
+    's8': [(1, "ab"), (2, "c"), (5, "b")],
+}
+
+GAPS = {
+    's1': [(1, "a"), (2, "b"), (5, "c")],
+    's2': [(1, "a"), (4, "b"), (5, "c")],
+    's3': [(1, "ab"), (2, "c"), (3, "a")],
+    's4': [(1, "a"), (2, "b"), (3, "c")],
+    's5': [(2, "b"), (3, "a"), (6, "c")],
+    's6': [(1, "c"), (3, "a"), (4, "bc")],
+    's7': [(1, "a"), (3, "b"), (4, "c"), (6, "ab")],
+}
+
+# Several students share a path, so deduplication weights the sequences
+DUPLICATES = {
+    's1': [(1, "a"), (2, "bc")],
+    's2': [(1, "a"), (2, "bc")],
+    's3': [(1, "a"), (2, "bc")],
+    's4': [(1, "ab"), (3, "c")],
+    's5': [(1, "ab"), (3, "c")],
+    's6': [(2, "a"), (3, "a"), (4, "b")],
+    's7': [(1, "c"), (2, "a"), (4, "b")],
+}
+
+def random_histories(students=30, items="abcdef", periods=8, seed=0):
+    """Return random histories of up to five terms, using every period from 1 to `periods`."""
+    rng = random.Random(seed)
+    histories = {}
+    for student in range(students):
+        times = sorted(rng.sample(range(1, periods + 1), rng.randint(1, 5)))
+        histories[f"s{student}"] = [(time, ''.join(sorted(rng.sample(items, rng.randint(1, 3))))) for time in times]
+    used = {time for terms in histories.values() for time, _ in terms}
+    assert used == set(range(1, periods + 1))
+    return histories
+
+def build_database(histories):
+    """Encode histories as the pipeline does: one row per item taken, times ranked into periods."""
+    rows = [(student, item, time) for student, terms in histories.items() for time, items in terms for item in items]
+    df = pd.DataFrame(rows, columns=['ID', 'Item', 'TimeGroup'])
+    return SequenceDatabase.from_frame(df).rank_times()
+
+def decode(sequence_db, results):
+    """Return mined results as ``{pattern: count}`` over item labels, whatever their level."""
+    return {
+        tuple(tuple(sequence_db.labels[item] for item in term) for term in pattern): count
+        for counts in results.values() for pattern, count in counts.items()
+    }
+
+def contains(pattern, terms, min_gap=0, max_gap=None, window=0):
+    """
+    Whether a student's terms hold the pattern, each element of the pattern being matched by the union of
+    a run of terms at most `window` apart, each run starting more than `min_gap` after the end of the run
+    before, and each run ending at most `max_gap` after the start of the run before.
+    """
+    times = [time for time, _ in terms]
+    runs = [(first, last) for first in range(len(terms)) for last in range(first, len(terms)) if times[last] - times[first] <= window]
+
+    def match(i, previous):
+        if i == len(pattern):
+            return True
+        for first, last in runs:
+            if not set(pattern[i]) <= {item for _, items in terms[first:last + 1] for item in items}:
+                continue
+            if previous is not None:
+                previous_first, previous_last = previous
+                if first <= previous_last or times[first] - times[previous_last] <= min_gap:
+                    continue
+                if max_gap is not None and times[last] - times[previous_first] > max_gap:
+                    continue
+            if match(i + 1, (first, last)):
+                return True
+        return False
+
+    return match(0, None)
+
+def support(pattern, histories, **constraints):
+    return sum(contains(pattern, terms, **constraints) for terms in histories.values())
+
+def frequent_patterns(histories, min_support, **constraints):
+    """
+    Return every pattern with at least `min_support` students, grown one item at a time from the frequent
+    single items; dropping the last item of a pattern keeps it contained, so no frequent pattern is missed.
+    """
+    items = sorted({item for terms in histories.values() for _, term in terms for item in term})
+    frontier = [((item,),) for item in items if support(((item,),), histories, **constraints) >= min_support]
+    found = {pattern: support(pattern, histories, **constraints) for pattern in frontier}
+    while frontier:
+        grown = []
+        for pattern in frontier:
+            extensions = [pattern + ((item,),) for item in items]
+            extensions += [pattern[:-1] + (pattern[-1] + (item,),) for item in items if item > pattern[-1][-1]]
+            for extension in extensions:
+                count = support(extension, histories, **constraints)
+                if count >= min_support:
+                    found[extension] = count
+                    grown.append(extension)
+        frontier = grown
+    return found
+
+def size(pattern):
+    return sum(len(term) for term in pattern)
+
+def mined_patterns(histories, min_support, **constraints):
+    """The patterns the engines report: frequent ones of two or more items."""
+    return {pattern: count for pattern, count in frequent_patterns(histories, min_support, **constraints).items() if size(pattern) >= 2}
+
+def is_subpattern(pattern, other):
+    """Whether `pattern` is contained in the pattern `other`."""
+    return contains(pattern, [(position, term) for position, term in enumerate(other)])
+
+def closed_patterns(patterns):
+    return {
+        pattern: count for pattern, count in patterns.items()
+        if not any(size(other) > size(pattern) and other_count == count and is_subpattern(pattern, other) for other, other_count in patterns.items())
+    }
+
+def maximal_patterns(patterns):
+    return {
+        pattern: count for pattern, count in patterns.items()
+        if not any(size(other) > size(pattern) and is_subpattern(pattern, other) for other in patterns)
+    }
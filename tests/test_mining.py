@@ -0,0 +1,149 @@
+"""
+Check the mining engines, counting backends, time constraints and closed/maximal patterns against the
+brute-force counter of `brute_force`, on small hand-built sequence databases.
+"""
+from itertools import combinations, product
+import pytest
+from brute_force import (
+    CLASSIC, GAPS, DUPLICATES, random_histories, build_database, decode, support, mined_patterns,
+    closed_patterns, maximal_patterns,
+)
+from gsp_algorithm import count_candidates, mine_sequences
+from incremental import IncrementalMiner
+from sequence_db import TimeConstraints
+
+RANDOM = random_histories()
+
+# (histories, min support) pairs the engines are checked on
+DATASETS = {
+    'classic': (CLASSIC, 2),
+    'gaps': (GAPS, 2),
+    'duplicates': (DUPLICATES, 2),
+    'random': (RANDOM, 4),
+}
+
+ENGINES = {
+    'gsp-hashtree': {'engine': 'gsp', 'counting': 'hashtree'},
+    'gsp-scan': {'engine': 'gsp', 'counting': 'scan'},
+    'gsp-workers': {'engine': 'gsp', 'workers': 2},
+    'gsp-batches': {'engine': 'gsp', 'candidate_batch': 3},
+    'gsp-unreduced': {'engine': 'gsp', 'reduce_database': False},
+    'spade': {'engine': 'spade'},
+    'prefixspan': {'engine': 'prefixspan'},
+}
+
+CONSTRAINTS = {
+    'max-gap-1': {'max_gap': 1},
+    'max-gap-2': {'max_gap': 2},
+    'min-gap-1': {'min_gap': 1},
+    'window-1': {'window': 1},
+    'window-1-max-gap-2': {'window': 1, 'max_gap': 2},
+    'min-gap-1-max-gap-3': {'min_gap': 1, 'max_gap': 3},
+    'all': {'min_gap': 1, 'max_gap': 4, 'window': 1},
+}
+
+@pytest.mark.parametrize('deduplicate', [False, True], ids=['raw', 'deduplicated'])
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('dataset', DATASETS)
+def test_engines_match_brute_force(dataset, engine, deduplicate):
+    histories, min_support = DATASETS[dataset]
+    sequence_db = build_database(histories)
+    if deduplicate:
+        sequence_db = sequence_db.deduplicate()
+
+    results = mine_sequences(sequence_db, min_support, **ENGINES[engine])
+
+    assert decode(sequence_db, results) == mined_patterns(histories, min_support)
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_engines_report_levels_by_item_count(engine):
+    sequence_db = build_database(CLASSIC)
+
+    results = mine_sequences(sequence_db, 2, **ENGINES[engine])
+
+    for level, counts in results.items():
+        assert all(level == f"Freq {sum(len(term) for term in pattern)}-Itemsets" for pattern in counts)
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_max_length(engine):
+    sequence_db = build_database(RANDOM)
+
+    results = mine_sequences(sequence_db, 4, max_length=3, **ENGINES[engine])
+
+    expected = {pattern: count for pattern, count in mined_patterns(RANDOM, 4).items() if sum(map(len, pattern)) <= 3}
+    assert decode(sequence_db, results) == expected
+
+@pytest.mark.parametrize('counting', ['hashtree', 'scan'])
+@pytest.mark.parametrize('constraints', CONSTRAINTS)
+@pytest.mark.parametrize('dataset', DATASETS)
+def test_time_constraints_match_brute_force(dataset, constraints, counting):
+    histories, min_support = DATASETS[dataset]
+    sequence_db = build_database(histories)
+
+    results = mine_sequences(sequence_db, min_support, counting=counting, **CONSTRAINTS[constraints])
+
+    assert decode(sequence_db, results) == mined_patterns(histories, min_support, **CONSTRAINTS[constraints])
+
+@pytest.mark.parametrize('counting', ['hashtree', 'scan'])
+@pytest.mark.parametrize('constraints', [None, *CONSTRAINTS])
+def test_counting_backends_count_every_candidate(constraints, counting):
+    # Infrequent candidates included: every pattern of two or three items over the items a, b and c
+    terms = [term for size in (1, 2, 3) for term in combinations("abc", size)]
+    patterns = sorted(
+        pattern for length in (1, 2, 3) for pattern in product(terms, repeat=length)
+        if sum(len(term) for term in pattern) in (2, 3)
+    )
+    sequence_db = build_database(GAPS).deduplicate()
+    codes = {label: code for code, label in enumerate(sequence_db.labels)}
+    candidates = [tuple(tuple(codes[item] for item in term) for term in pattern) for pattern in patterns]
+    options = CONSTRAINTS.get(constraints, {})
+    time_constraints = TimeConstraints(**options) if options else None
+
+    counts = count_candidates(candidates, sequence_db, counting, time_constraints)
+
+    for pattern, candidate in zip(patterns, candidates):
+        assert counts.get(candidate, 0) == support(pattern, GAPS, **options), pattern
+
+@pytest.mark.parametrize('kind', ['closed', 'maximal'])
+@pytest.mark.parametrize('deduplicate', [False, True], ids=['raw', 'deduplicated'])
+@pytest.mark.parametrize('dataset', DATASETS)
+def test_closed_and_maximal_patterns(dataset, deduplicate, kind):
+    histories, min_support = DATASETS[dataset]
+    sequence_db = build_database(histories)
+    if deduplicate:
+        sequence_db = sequence_db.deduplicate()
+
+    results = mine_sequences(sequence_db, min_support, engine='prefixspan', patterns=kind)
+
+    select = closed_patterns if kind == 'closed' else maximal_patterns
+    assert decode(sequence_db, results) == select(mined_patterns(histories, min_support))
+
+@pytest.mark.parametrize('counting', ['hashtree', 'scan'])
+@pytest.mark.parametrize('top_k', [1, 3, 10, 1000])
+@pytest.mark.parametrize('dataset', DATASETS)
+def test_top_k(dataset, top_k, counting):
+    histories, min_support = DATASETS[dataset]
+    sequence_db = build_database(histories)
+
+    results = mine_sequences(sequence_db, min_support, counting=counting, top_k=top_k)
+
+    # Every pattern as frequent as the k-th most frequent one, with the min support as a floor
+    expected = mined_patterns(histories, min_support)
+    counts = sorted(expected.values(), reverse=True)
+    if len(counts) >= top_k:
+        expected = {pattern: count for pattern, count in expected.items() if count >= counts[top_k - 1]}
+    assert decode(sequence_db, results) == expected
+
+def test_incremental_updates_match_brute_force(tmp_path):
+    miner = IncrementalMiner(str(tmp_path))
+    miner.mine(build_database(RANDOM), 8, 'random')
+
+    # A student takes another term, which the stored counts are updated with instead of mining again
+    updated = {student: list(terms) for student, terms in RANDOM.items()}
+    student = next(student for student, terms in updated.items() if terms[-1][0] < 8)
+    updated[student].append((8, "abc"))
+    sequence_db = build_database(updated)
+    results, changed = miner.mine(sequence_db, 8, 'random')
+
+    assert changed == 2
+    assert decode(sequence_db, results) == mined_patterns(updated, 8)